@@ -1,12 +1,76 @@
+import hashlib
+import json
 import os
-from flask import Flask, jsonify
+import time
+from flask import Flask, g, jsonify, request, Response
 from dotenv import load_dotenv
+from prometheus_client import (
+    CollectorRegistry,
+    Gauge,
+    GCCollector,
+    Histogram,
+    PlatformCollector,
+    ProcessCollector,
+    generate_latest,
+    multiprocess,
+    CONTENT_TYPE_LATEST,
+    start_http_server,
+)
 
 # Load environment variables from .env file
 load_dotenv()
 
 app = Flask(__name__)
 
+# Prometheus Metrics, in a registry of this API's own so that it can share a
+# process (e.g. a test run) with the sensor API, which exports the same names
+METRICS_REGISTRY = CollectorRegistry()
+ProcessCollector(registry=METRICS_REGISTRY)
+PlatformCollector(registry=METRICS_REGISTRY)
+GCCollector(registry=METRICS_REGISTRY)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Time spent handling a request",
+    ["endpoint", "method", "status"],
+    registry=METRICS_REGISTRY,
+)
+IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "Number of requests being handled",
+    ["endpoint"],
+    multiprocess_mode="livesum",
+    registry=METRICS_REGISTRY,
+)
+
+
+def endpoint_label():
+    """The matched route, so that unknown paths do not create new label values."""
+    return request.url_rule.rule if request.url_rule else "unmatched"
+
+
+@app.before_request
+def start_request_timer():
+    """Starts timing the request and counts it as in flight."""
+    g.request_started = time.perf_counter()
+    IN_FLIGHT.labels(endpoint_label()).inc()
+
+
+@app.after_request
+def observe_request(response):
+    """Records the request duration by endpoint, method and status."""
+    REQUEST_LATENCY.labels(endpoint_label(), request.method, response.status_code).observe(
+        time.perf_counter() - g.request_started
+    )
+    return response
+
+
+@app.teardown_request
+def end_request(exc):
+    """Removes the request from the in-flight gauge, even if it failed."""
+    if "request_started" in g:
+        IN_FLIGHT.labels(endpoint_label()).dec()
+
 
 @app.route("/")
 def home():
@@ -14,14 +78,68 @@ def home():
     return jsonify({"message": "Welcome to the Basic Versioning API!"})
 
 
+# Browsers and the ingress may keep /version this long before revalidating
+VERSION_MAX_AGE = int(os.getenv("VERSION_MAX_AGE", "60"))
+
+
+def encode(payload):
+    """Pre-encodes a JSON body once, with the strong ETag of its bytes."""
+    body = json.dumps(payload, separators=(",", ":")).encode()
+    return body, hashlib.sha1(body).hexdigest()
+
+
+def cached_response(cached, max_age):
+    """Serves a pre-encoded body, or an empty 304 if the client already has it."""
+    body, etag = cached
+    headers = {"ETag": f'"{etag}"', "Cache-Control": f"public, max-age={max_age}"}
+    if request.if_none_match.contains_weak(etag):
+        return Response(status=304, headers=headers)
+    return Response(body, headers=headers, content_type="application/json")
+
+
+HEALTH_BODY = encode({"status": "ok"})
+_version_body = None
+
+
+def version_body():
+    """The /version body, built from APP_VERSION on first use.
+
+    The version cannot change while the process runs, so it is read only once.
+    """
+    global _version_body
+    if _version_body is None:
+        _version_body = encode({"version": os.getenv("APP_VERSION", "v0.0.1")})
+    return _version_body
+
+
 @app.route("/version")
 def get_version():
     """Returns the application version from an environment variable."""
-    version = os.getenv("APP_VERSION", "v0.0.1")  # Default version if not set
-    return jsonify({"version": version}), 200  # Explicit 200 status code
+    return cached_response(version_body(), VERSION_MAX_AGE)
+
+
+@app.route("/health")
+def health():
+    """Liveness and readiness probe; does no work beyond answering."""
+    return cached_response(HEALTH_BODY, 0)
+
+
+@app.route("/metrics")
+def metrics():
+    """Expose Prometheus metrics, aggregated across workers in multiprocess mode."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return Response(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
+    return Response(generate_latest(METRICS_REGISTRY), content_type=CONTENT_TYPE_LATEST)
 
 
 if __name__ == "__main__":
     # Set debug mode from environment variable (default to False if not set)
     debug_mode = os.getenv("FLASK_DEBUG", "False").lower() in ["true", "1", "t"]
+    # Start Prometheus metrics server in the background; the debug reloader runs this
+    # file twice, so only its child process (WERKZEUG_RUN_MAIN) serves metrics.
+    # Port 8001 by default so that it can run next to the sensor API on 8000.
+    if not debug_mode or os.getenv("WERKZEUG_RUN_MAIN") == "true":
+        start_http_server(int(os.getenv("METRICS_PORT", "8001")), registry=METRICS_REGISTRY)
     app.run(host="0.0.0.0", port=5001, debug=debug_mode)
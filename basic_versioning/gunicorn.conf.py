@@ -0,0 +1,45 @@
+"""
+Gunicorn settings for serving the Basic Versioning API in production.
+
+Start with: gunicorn -c gunicorn.conf.py app_version:app
+
+When PROMETHEUS_MULTIPROC_DIR is set, metrics from all workers are aggregated
+and served on port 8000 by the master process.
+"""
+
+import os
+import shutil
+
+from prometheus_client import CollectorRegistry, multiprocess, start_http_server
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5001")
+workers = int(os.getenv("GUNICORN_WORKERS", "2"))
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+worker_class = "gthread"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+accesslog = os.getenv("GUNICORN_ACCESSLOG")  # "-" logs to stdout
+
+METRICS_PORT = int(os.getenv("METRICS_PORT", "8000"))
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+
+def on_starting(server):
+    """Start every run with an empty multiprocess metrics directory."""
+    if MULTIPROC_DIR:
+        shutil.rmtree(MULTIPROC_DIR, ignore_errors=True)
+        os.makedirs(MULTIPROC_DIR, exist_ok=True)
+
+
+def when_ready(server):
+    """Serve metrics aggregated across all workers."""
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        start_http_server(METRICS_PORT, registry=registry)
+
+
+def child_exit(server, worker):
+    """Drop live gauges of workers that have exited."""
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(worker.pid)
@@ -25,3 +25,37 @@ def test_version(client):
     json_data = response.get_json()
     assert "version" in json_data
     assert json_data["version"] == "v1.2.3"
+
+
+def test_version_conditional_get(client):
+    """Test that /version is answered with 304 when the client has the current ETag."""
+    response = client.get("/version")
+    etag = response.headers["ETag"]
+    assert response.headers["Cache-Control"].startswith("public, max-age=")
+
+    response = client.get("/version", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.data == b""
+
+    response = client.get("/version", headers={"If-None-Match": '"outdated"'})
+    assert response.status_code == 200
+    assert response.get_json()["version"] == "v1.2.3"
+
+
+def test_health(client):
+    """Test that /health reports the service as up."""
+    response = client.get("/health")
+    assert response.status_code == 200
+    assert response.get_json() == {"status": "ok"}
+
+
+def test_metrics(client):
+    """Test that /metrics exposes request latency by endpoint and status."""
+    client.get("/version")
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert (
+        'http_request_duration_seconds_count{endpoint="/version",'
+        'method="GET",status="200"}' in response.get_data(as_text=True)
+    )
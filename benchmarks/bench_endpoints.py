@@ -0,0 +1,127 @@
+"""
+pytest-benchmark suite for the hot paths of both services.
+
+Upstream calls go to a local stub (benchmarks/stub_upstream.py), never to the
+real APIs. Run from the repository root and compare against a saved baseline:
+
+    python -m pytest benchmarks/bench_endpoints.py --benchmark-autosave
+    python -m pytest benchmarks/bench_endpoints.py --benchmark-compare \
+        --benchmark-compare-fail=mean:20%
+
+Add ``--benchmark-timer=time.process_time`` to measure CPU time per request
+instead of wall time; the "temperature" and "version" groups then show what
+pre-encoded bodies and 304 answers to If-None-Match save.
+"""
+
+import os
+from unittest.mock import patch
+
+import pytest
+
+from basic_versioning.app_version import app as versioning_app
+from benchmarks import stub_upstream
+from sensor_api import app as sensor_module
+from sensor_api.responses import BodyCache
+
+
+@pytest.fixture(scope="module")
+def stub():
+    server = stub_upstream.start()
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture
+def sensor_client(stub):
+    with patch.object(sensor_module, "OPENWEATHER_URL", f"{stub.url}/data/2.5/weather"), \
+            patch.dict(os.environ, {"OPENWEATHER_API_KEY": "stub"}):
+        sensor_module.TEMPERATURE_CACHE.clear()
+        yield sensor_module.app.test_client()
+
+
+@pytest.fixture
+def versioning_client():
+    return versioning_app.test_client()
+
+
+@pytest.mark.benchmark(group="temperature")
+def test_temperature_cached(benchmark, sensor_client):
+    """/temperature served from the in-process cache."""
+    sensor_client.get("/temperature")
+    response = benchmark(sensor_client.get, "/temperature")
+    assert response.status_code == 200
+
+
+@pytest.mark.benchmark(group="temperature")
+def test_temperature_not_modified(benchmark, sensor_client):
+    """/temperature revalidated with If-None-Match, answered with 304."""
+    etag = sensor_client.get("/temperature").headers["ETag"]
+    response = benchmark(sensor_client.get, "/temperature", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+
+@pytest.mark.benchmark(group="temperature body")
+def test_temperature_body_encoded_per_request(benchmark, sensor_client):
+    """Encoding the /temperature body on every request, as before bodies were cached."""
+    reading = {"temperature_celsius": 15.2, "timestamp": 1742306400.0}
+    with sensor_module.app.app_context():
+        benchmark(lambda: sensor_module.jsonify(sensor_module.reading_payload(reading)).data)
+
+
+@pytest.mark.benchmark(group="temperature body")
+def test_temperature_body_precomputed(benchmark, sensor_client):
+    """Looking up the /temperature body of an unchanged reading."""
+    reading = {"temperature_celsius": 15.2, "timestamp": 1742306400.0}
+    bodies = BodyCache(sensor_module.reading_payload)
+    benchmark(lambda: bodies.get(reading).body)
+
+
+def test_temperature_upstream(benchmark, sensor_client):
+    """/temperature with a cache miss, fetching from the stub upstream."""
+
+    def fetch():
+        sensor_module.TEMPERATURE_CACHE.clear()
+        return sensor_client.get("/temperature")
+
+    response = benchmark(fetch)
+    assert response.status_code == 200
+
+
+def test_temperature_stats(benchmark, sensor_client):
+    """/temperature/stats over all windows."""
+    sensor_client.get("/temperature")
+    response = benchmark(sensor_client.get, "/temperature/stats")
+    assert response.status_code == 200
+
+
+def test_sensor_metrics(benchmark, sensor_client):
+    """/metrics of the sensor API."""
+    response = benchmark(sensor_client.get, "/metrics")
+    assert response.status_code == 200
+
+
+@pytest.mark.benchmark(group="version")
+def test_version(benchmark, versioning_client):
+    """/version of the versioning API."""
+    response = benchmark(versioning_client.get, "/version")
+    assert response.status_code == 200
+
+
+@pytest.mark.benchmark(group="version")
+def test_version_not_modified(benchmark, versioning_client):
+    """/version revalidated with If-None-Match, answered with 304."""
+    etag = versioning_client.get("/version").headers["ETag"]
+    response = benchmark(versioning_client.get, "/version", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+
+def test_health(benchmark, sensor_client):
+    """/health, as polled by the Kubernetes probes."""
+    response = benchmark(sensor_client.get, "/health")
+    assert response.status_code == 200
+
+
+def test_versioning_metrics(benchmark, versioning_client):
+    """/metrics of the versioning API."""
+    response = benchmark(versioning_client.get, "/metrics")
+    assert response.status_code == 200
@@ -0,0 +1,45 @@
+"""
+Query latency of the rolling-window statistics as the history grows.
+
+Fills a TimeSeriesStore with 1k to 1M samples one second apart and times
+stats() for every window. Latency should stay flat because queries use
+incremental aggregates instead of rescanning the history:
+
+    python -m benchmarks.bench_stats
+"""
+
+import argparse
+import random
+import time
+
+from sensor_api.stats import TimeSeriesStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--queries", type=int, default=10000)
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000]
+    )
+    args = parser.parse_args()
+
+    windows = {"5m": 300, "1h": 3600, "24h": 86400, "all": float("inf")}
+    print(f"{'samples':>10} " + " ".join(f"{name + ' µs':>10}" for name in windows))
+    for size in args.sizes:
+        store = TimeSeriesStore(windows, capacity=size)
+        now = time.time() - size
+        for _ in range(size):
+            now += 1
+            store.add(random.uniform(-5, 35), now)
+
+        row = []
+        for name in windows:
+            started = time.perf_counter()
+            for _ in range(args.queries):
+                store.stats(name, now)
+            row.append((time.perf_counter() - started) / args.queries * 1e6)
+        print(f"{size:>10} " + " ".join(f"{us:>10.2f}" for us in row))
+
+
+if __name__ == "__main__":
+    main()
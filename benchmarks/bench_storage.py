@@ -0,0 +1,63 @@
+"""
+Ingest benchmark for the reading storage pipeline.
+
+Measures how many readings/sec the request-side buffer accepts and how many
+readings/sec the writer uploads. Uploads go to an in-process moto S3 stand-in,
+or to a real MinIO when MINIO_ENDPOINT (plus MINIO_ACCESS_KEY and
+MINIO_SECRET_KEY) is set:
+
+    python -m benchmarks.bench_storage --readings 100000
+"""
+
+import argparse
+import os
+import time
+from contextlib import nullcontext
+
+import boto3
+from moto import mock_aws
+
+from sensor_api.storage import ReadingStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--readings", type=int, default=100000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    endpoint = os.getenv("MINIO_ENDPOINT")
+    with nullcontext() if endpoint else mock_aws():
+        client = boto3.client(
+            "s3",
+            endpoint_url=endpoint,
+            region_name="us-east-1",
+            aws_access_key_id=os.getenv("MINIO_ACCESS_KEY", "testing"),
+            aws_secret_access_key=os.getenv("MINIO_SECRET_KEY", "testing"),
+        )
+        store = ReadingStore(
+            client, "sensor-data-bench", buffer_size=args.readings, batch_size=args.batch_size
+        )
+        store.ensure_bucket()
+
+        start_ts = time.time() - args.readings
+        readings = [
+            {"timestamp": start_ts + i, "temperature_celsius": 15.0 + i % 10}
+            for i in range(args.readings)
+        ]
+
+        started = time.perf_counter()
+        for reading in readings:
+            store.append(reading)
+        ingest = time.perf_counter() - started
+
+        started = time.perf_counter()
+        stored = store.flush()
+        upload = time.perf_counter() - started
+
+    print(f"buffer ingest: {args.readings / ingest:12,.0f} readings/s")
+    print(f"upload:        {stored / upload:12,.0f} readings/s ({stored} readings)")
+
+
+if __name__ == "__main__":
+    main()
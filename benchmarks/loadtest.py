@@ -0,0 +1,88 @@
+"""
+Closed-loop HTTP load test reporting requests/sec and latency percentiles.
+
+Each URL is loaded in turn by `--concurrency` threads for `--duration` seconds,
+every thread reusing one keep-alive connection. Point the sensor API at the
+local stub upstream so results do not depend on the real providers:
+
+    python -m benchmarks.stub_upstream --port 8081 &
+    OPENWEATHER_URL=http://localhost:8081/data/2.5/weather OPENWEATHER_API_KEY=stub \
+        gunicorn -c sensor_api/gunicorn.conf.py sensor_api.app:app &
+    (cd basic_versioning && gunicorn -c gunicorn.conf.py app_version:app &)
+    python benchmarks/loadtest.py http://localhost:5000/temperature \
+        http://localhost:5001/version http://localhost:5000/metrics --concurrency 32
+
+Pass the same endpoint served by two servers (e.g. the Flask dev server and
+gunicorn on another GUNICORN_BIND port) to compare them side by side.
+"""
+
+import argparse
+import threading
+import time
+
+import requests
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return float("nan")
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def run(url, concurrency, duration):
+    """Load url and return (requests/sec, p50 ms, p99 ms, errors)."""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker():
+        session = requests.Session()
+        local, failed = [], 0
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                response = session.get(url, timeout=10)
+                ok = response.status_code < 500
+            except requests.RequestException:
+                ok = False
+            local.append(time.perf_counter() - start)
+            failed += not ok
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return (
+        len(latencies) / elapsed,
+        percentile(latencies, 50) * 1000,
+        percentile(latencies, 99) * 1000,
+        errors[0],
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("urls", nargs="+", help="URLs to load, one after another")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per URL")
+    args = parser.parse_args()
+
+    print(f"{'url':50} {'req/s':>10} {'p50 ms':>10} {'p99 ms':>10} {'errors':>8}")
+    for url in args.urls:
+        rps, p50, p99, errors = run(url, args.concurrency, args.duration)
+        print(f"{url:50} {rps:10.1f} {p50:10.2f} {p99:10.2f} {errors:8d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Local stand-in for the OpenWeather and openSenseMap APIs.
+
+Serves fixed readings after an optional delay, so benchmarks and load tests do
+not depend on (or get rate limited by) the real providers:
+
+    python -m benchmarks.stub_upstream --port 8081 --delay 0.05
+    OPENWEATHER_URL=http://localhost:8081/data/2.5/weather OPENWEATHER_API_KEY=stub \\
+        python -m sensor_api.app
+"""
+
+import argparse
+import json
+import socket
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answers /data/2.5/weather and /boxes/<id> like the real APIs."""
+
+    protocol_version = "HTTP/1.1"
+    delay = 0.0
+
+    def setup(self):
+        super().setup()
+        # Headers and body are separate writes; don't let Nagle hold back the body
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def do_GET(self):
+        time.sleep(self.delay)
+        path = self.path.split("?")[0]
+
+        if path == "/data/2.5/weather":
+            payload = {"main": {"temp": 15.0}}
+        elif path.startswith("/boxes/"):
+            created_at = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+            payload = {
+                "sensors": [
+                    {
+                        "unit": "°C",
+                        "lastMeasurement": {"value": "15.0", "createdAt": created_at},
+                    }
+                ]
+            }
+        else:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start(port=0, delay=0.0):
+    """Start the stub in a daemon thread and return the server; its URL is server.url."""
+    handler = type("DelayedStubHandler", (StubHandler,), {"delay": delay})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds per response")
+    args = parser.parse_args()
+
+    server = start(args.port, args.delay)
+    print(f"Stub upstream listening on {server.url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
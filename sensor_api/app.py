@@ -1,46 +1,314 @@
 import os
-import requests
-from flask import Flask, jsonify, Response
-from prometheus_client import Counter, generate_latest, CONTENT_TYPE_LATEST, start_http_server
+import time
+from datetime import datetime, timezone
+from itertools import chain
+
+from botocore.exceptions import BotoCoreError, ClientError
+from flask import Flask, g, jsonify, request, Response
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    CONTENT_TYPE_LATEST,
+    start_http_server,
+)
+
+from sensor_api.cache import RedisBackend, TTLCache
+from sensor_api.errors import UpstreamError
+from sensor_api.poller import Poller
+from sensor_api.responses import BodyCache, CachedBody, conditional_response
+from sensor_api.sensebox import SENSEBOX_API, SenseBoxAggregator
+from sensor_api.stats import TimeSeriesStore, parse_window
+from sensor_api.storage import ReadingStore
+from sensor_api.upstream import UpstreamClient
 
 app = Flask(__name__)
 
-# Prometheus Metrics
-REQUEST_COUNT = Counter("request_count", "Number of requests served")
-ERROR_COUNT = Counter("error_count", "Number of errors encountered")
+# Prometheus Metrics; the sensor API's modules all use the default registry
+METRICS_REGISTRY = REGISTRY
+REQUEST_COUNT = Counter("request_count", "Number of requests served", registry=METRICS_REGISTRY)
+ERROR_COUNT = Counter("error_count", "Number of errors encountered", registry=METRICS_REGISTRY)
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Time spent handling a request",
+    ["endpoint", "method", "status"],
+    registry=METRICS_REGISTRY,
+)
+IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "Number of requests being handled",
+    ["endpoint"],
+    multiprocess_mode="livesum",
+    registry=METRICS_REGISTRY,
+)
+
+
+def endpoint_label():
+    """The matched route, so that unknown paths do not create new label values."""
+    return request.url_rule.rule if request.url_rule else "unmatched"
+
+
+@app.before_request
+def start_request_timer():
+    """Starts timing the request and counts it as in flight."""
+    g.request_started = time.perf_counter()
+    IN_FLIGHT.labels(endpoint_label()).inc()
+
+
+@app.after_request
+def observe_request(response):
+    """Records the request duration by endpoint, method and status."""
+    REQUEST_LATENCY.labels(endpoint_label(), request.method, response.status_code).observe(
+        time.perf_counter() - g.request_started
+    )
+    return response
+
+
+@app.teardown_request
+def end_request(exc):
+    """Removes the request from the in-flight gauge, even if it failed."""
+    if "request_started" in g:
+        IN_FLIGHT.labels(endpoint_label()).dec()
+
+
+OPENWEATHER_URL = os.getenv("OPENWEATHER_URL", "http://api.openweathermap.org/data/2.5/weather")
+OPENWEATHER_CITY = os.getenv("OPENWEATHER_CITY", "London")
+
+# Retry and circuit breaker settings shared by all upstream clients
+UPSTREAM_SETTINGS = {
+    "retries": int(os.getenv("UPSTREAM_RETRIES", "3")),
+    "backoff_factor": float(os.getenv("UPSTREAM_BACKOFF", "0.5")),
+    "backoff_max": float(os.getenv("UPSTREAM_BACKOFF_MAX", "10")),
+    "failure_threshold": int(os.getenv("UPSTREAM_BREAKER_THRESHOLD", "5")),
+    "reset_timeout": float(os.getenv("UPSTREAM_BREAKER_RESET", "30")),
+}
+
+OPENWEATHER = UpstreamClient(
+    "openweather", pool_size=int(os.getenv("UPSTREAM_POOL_SIZE", "10")), **UPSTREAM_SETTINGS
+)
+
+# When senseBox IDs are configured, /temperature averages them instead of OpenWeather
+SENSEBOX_IDS = [
+    box_id.strip() for box_id in os.getenv("SENSEBOX_IDS", "").split(",") if box_id.strip()
+]
+SENSEBOX = (
+    SenseBoxAggregator(
+        SENSEBOX_IDS,
+        base_url=os.getenv("SENSEBOX_API_URL", SENSEBOX_API),
+        max_workers=int(os.getenv("SENSEBOX_MAX_WORKERS", "32")),
+        timeout=float(os.getenv("SENSEBOX_TIMEOUT", "5")),
+        deadline=float(os.getenv("SENSEBOX_DEADLINE", "10")),
+        # A broken box is skipped rather than retried as often as a single upstream
+        **dict(UPSTREAM_SETTINGS, retries=int(os.getenv("SENSEBOX_RETRIES", "1"))),
+    )
+    if SENSEBOX_IDS
+    else None
+)
+
+# Readings are fresh for TEMPERATURE_CACHE_TTL seconds, then served stale while
+# a refresh runs, so that no reading older than one hour is ever returned.
+# With VALKEY_URL set, readings are shared by all workers and replicas.
+VALKEY_URL = os.getenv("VALKEY_URL")
+TEMPERATURE_CACHE = TTLCache(
+    "temperature",
+    ttl=float(os.getenv("TEMPERATURE_CACHE_TTL", "300")),
+    stale_ttl=float(os.getenv("TEMPERATURE_CACHE_STALE_TTL", "3300")),
+    backend=RedisBackend.from_url(VALKEY_URL) if VALKEY_URL else None,
+)
+
+# Readings older than this are never served
+MAX_READING_AGE = 3600
+
+# Status thresholds in degrees Celsius
+TOO_COLD_BELOW = float(os.getenv("TEMPERATURE_TOO_COLD_BELOW", "10"))
+TOO_HOT_ABOVE = float(os.getenv("TEMPERATURE_TOO_HOT_ABOVE", "30"))
+
+# Rolling statistics over recent readings; see sensor_api/stats.py for memory use
+STATS_WINDOWS = os.getenv("STATS_WINDOWS", "5m,1h,24h").split(",")
+TEMPERATURE_STATS = TimeSeriesStore(
+    {name: parse_window(name) for name in STATS_WINDOWS},
+    capacity=int(os.getenv("STATS_CAPACITY", "8640")),
+)
+
+# Every fetched reading is buffered and uploaded to MINIO_ENDPOINT in batches
+MINIO_ENDPOINT = os.getenv("MINIO_ENDPOINT")
+READINGS = (
+    ReadingStore.from_endpoint(
+        MINIO_ENDPOINT,
+        access_key=os.getenv("MINIO_ACCESS_KEY"),
+        secret_key=os.getenv("MINIO_SECRET_KEY"),
+        connect_timeout=float(os.getenv("STORAGE_CONNECT_TIMEOUT", "1")),
+        read_timeout=float(os.getenv("STORAGE_READ_TIMEOUT", "5")),
+        max_attempts=int(os.getenv("STORAGE_MAX_ATTEMPTS", "2")),
+        bucket=os.getenv("MINIO_BUCKET", "sensor-data"),
+        buffer_size=int(os.getenv("STORAGE_BUFFER_SIZE", "10000")),
+        batch_size=int(os.getenv("STORAGE_BATCH_SIZE", "1000")),
+        flush_interval=float(os.getenv("STORAGE_FLUSH_INTERVAL", "300")),
+    )
+    if MINIO_ENDPOINT
+    else None
+)
+
+# /readings lists one storage prefix per hour, so the queried range is capped
+READINGS_MAX_RANGE = parse_window(os.getenv("READINGS_MAX_RANGE", "7d"))
+LATEST_TIMESTAMP = datetime(9999, 1, 1, tzinfo=timezone.utc).timestamp()
+
+
+def fetch_temperature(api_key, city):
+    """Fetches the current temperature for a city from OpenWeather API."""
+    response = OPENWEATHER.get(
+        OPENWEATHER_URL, params={"q": city, "appid": api_key, "units": "metric"}
+    )
+
+    if response.status_code != 200:
+        raise UpstreamError("Failed to fetch data")
+
+    data = response.json()
+
+    if "main" not in data or "temp" not in data["main"]:
+        raise UpstreamError("Invalid API response")
+
+    return data["main"]["temp"]
+
+
+def load_temperature():
+    """Fetches the current reading from the configured source as a response dict."""
+    if SENSEBOX is not None:
+        reading = SENSEBOX.aggregate()._asdict()
+    else:
+        api_key = os.getenv("OPENWEATHER_API_KEY")
+
+        if not api_key:
+            raise UpstreamError("API key missing")
+
+        reading = {"temperature_celsius": fetch_temperature(api_key, OPENWEATHER_CITY)}
+
+    reading["timestamp"] = time.time()
+    if READINGS is not None:
+        # Buffered for object storage without blocking
+        READINGS.append(reading)
+    observe_reading(reading)
+    return reading
+
+
+def observe_reading(reading):
+    """Adds a reading to the rolling statistics; repeated readings are ignored."""
+    TEMPERATURE_STATS.add(reading["temperature_celsius"], reading["timestamp"])
+
+
+def reading_key():
+    """Cache key of the configured source."""
+    return "sensebox" if SENSEBOX is not None else OPENWEATHER_CITY
+
+
+def temperature_status(temp):
+    """Classifies a temperature in degrees Celsius."""
+    if temp < TOO_COLD_BELOW:
+        return "Too Cold"
+    return "Too Hot" if temp > TOO_HOT_ABOVE else "Good"
+
+
+def poll_shared_temperature():
+    """Reads through the shared cache, so only one replica calls upstream per TTL."""
+    reading, stored_at = TEMPERATURE_CACHE.get_entry(
+        reading_key(), load_temperature, serve_stale=False
+    )
+    # Readings fetched by other replicas still count towards this replica's statistics
+    observe_reading(reading)
+    return reading, stored_at
+
+
+# Background refresh of the configured source; started alongside the server
+TEMPERATURE_POLLER = Poller(
+    "temperature",
+    poll_shared_temperature if VALKEY_URL else load_temperature,
+    interval=float(os.getenv("TEMPERATURE_POLL_INTERVAL", "300")),
+    jitter=float(os.getenv("TEMPERATURE_POLL_JITTER", "0.1")),
+    timestamped=bool(VALKEY_URL),
+    # A shared reading may be nearly expired when fetched; poll again once it is
+    max_age=TEMPERATURE_CACHE.ttl if VALKEY_URL else None,
+)
+
+
+def reading_payload(reading):
+    """The /temperature body of a reading."""
+    return dict(reading, status=temperature_status(reading["temperature_celsius"]))
+
+
+def snapshot_payload(snapshot):
+    """The /temperature body of a poller snapshot, flagged stale while the source fails."""
+    payload = reading_payload(snapshot.value)
+    if snapshot.error:
+        # The source is failing; the reading we still have is getting older
+        payload["stale"] = True
+        payload["upstream_error"] = snapshot.error
+    return payload
+
+
+# Bodies are encoded once per reading or snapshot, not once per request
+READING_BODIES = BodyCache(reading_payload)
+SNAPSHOT_BODIES = BodyCache(snapshot_payload)
+HEALTH_BODY = CachedBody({"status": "ok"})
+
+
+def snapshot_response(snapshot):
+    """Builds the /temperature response from the poller snapshot without any I/O."""
+    if snapshot is None or snapshot.value is None:
+        ERROR_COUNT.inc()
+        error = snapshot.error if snapshot else None
+        return jsonify({"error": "No temperature data available yet", "detail": error}), 503
+
+    age = snapshot.age()
+
+    if age > MAX_READING_AGE:
+        ERROR_COUNT.inc()
+        return (
+            jsonify(
+                {
+                    "error": "Temperature data is too old",
+                    "age_seconds": round(age, 1),
+                    "detail": snapshot.error,
+                }
+            ),
+            503,
+        )
+
+    return conditional_response(
+        SNAPSHOT_BODIES.get(snapshot), TEMPERATURE_POLLER.interval, age
+    )
+
+
+@app.route("/health", methods=["GET"])
+def health():
+    """Liveness and readiness probe; does no work beyond answering."""
+    return conditional_response(HEALTH_BODY, 0)
 
 
 @app.route("/temperature", methods=["GET"])
 def get_temperature():
-    """Fetches temperature from OpenWeather API and determines status."""
+    """Returns the latest temperature for the configured city and determines status."""
     REQUEST_COUNT.inc()  # Increment request count
 
-    api_key = os.getenv("OPENWEATHER_API_KEY")
+    if TEMPERATURE_POLLER.running:
+        return snapshot_response(TEMPERATURE_POLLER.snapshot)
 
-    if not api_key:
+    if SENSEBOX is None and not os.getenv("OPENWEATHER_API_KEY"):
         ERROR_COUNT.inc()  # Increment error count for missing API key
         return jsonify({"error": "API key missing"}), 500
 
     try:
-        response = requests.get(
-            f"http://api.openweathermap.org/data/2.5/weather?q=London&appid={api_key}&units=metric",
-            timeout=5,
+        reading, stored_at = TEMPERATURE_CACHE.get_entry(reading_key(), load_temperature)
+        return conditional_response(
+            READING_BODIES.get(reading), TEMPERATURE_CACHE.ttl, time.time() - stored_at
         )
 
-        if response.status_code != 200:
-            ERROR_COUNT.inc()
-            return jsonify({"error": "Failed to fetch data"}), 500
-
-        data = response.json()
-
-        if "main" not in data or "temp" not in data["main"]:
-            ERROR_COUNT.inc()
-            return jsonify({"error": "Invalid API response"}), 500
-
-        temp = data["main"]["temp"]
-        status = "Good" if 10 <= temp <= 30 else "Too Cold" if temp < 10 else "Too Hot"
-
-        return jsonify({"temperature_celsius": temp, "status": status})
+    except UpstreamError as e:
+        ERROR_COUNT.inc()
+        return jsonify({"error": str(e)}), 500
 
     except Exception as e:
         app.logger.error(f"Error fetching data: {e}")
@@ -48,13 +316,107 @@ def get_temperature():
         return jsonify({"error": f"Unexpected error: {str(e)}"}), 500
 
 
+@app.route("/temperature/stats", methods=["GET"])
+def get_temperature_stats():
+    """Returns min, max, mean, percentiles and trend for one window or all windows."""
+    window = request.args.get("window")
+
+    if window is None:
+        return jsonify({name: TEMPERATURE_STATS.stats(name) for name in STATS_WINDOWS})
+
+    if window not in TEMPERATURE_STATS.windows:
+        return jsonify({"error": f"Unknown window, expected one of {STATS_WINDOWS}"}), 400
+
+    return jsonify({window: TEMPERATURE_STATS.stats(window)})
+
+
 @app.route("/metrics", methods=["GET"])
 def metrics():
-    """Expose Prometheus metrics."""
-    return Response(generate_latest(), content_type=CONTENT_TYPE_LATEST)
+    """Expose Prometheus metrics, aggregated across workers in multiprocess mode."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return Response(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
+    return Response(generate_latest(METRICS_REGISTRY), content_type=CONTENT_TYPE_LATEST)
+
+
+def parse_time(value, default):
+    """Parses a query parameter given as Unix seconds or ISO 8601."""
+    if value is None:
+        return default
+    try:
+        timestamp = float(value)
+    except ValueError:
+        timestamp = datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    # Also rejects nan and inf, which would only fail once the response is streaming
+    if not 0 <= timestamp <= LATEST_TIMESTAMP:
+        raise ValueError(f"Timestamp out of range: {value}")
+    return timestamp
+
+
+@app.route("/readings", methods=["GET"])
+def get_readings():
+    """Streams stored readings between start and end (default: the last hour) as NDJSON."""
+    if READINGS is None:
+        return jsonify({"error": "Storage not configured"}), 503
+
+    try:
+        end = parse_time(request.args.get("end"), time.time())
+        start = parse_time(request.args.get("start"), end - 3600)
+    except ValueError:
+        return jsonify({"error": "start and end must be Unix seconds or ISO 8601"}), 400
+
+    if start >= end:
+        return jsonify({"error": "start must be before end"}), 400
+    if end - start > READINGS_MAX_RANGE:
+        return (
+            jsonify({"error": f"The range may span at most {READINGS_MAX_RANGE:g} seconds"}),
+            400,
+        )
+
+    lines = READINGS.query(start, end)
+    try:
+        # Run the first storage calls before the response starts, so that an
+        # unreachable bucket is a 503 rather than a broken 200 stream
+        first = next(lines, None)
+    except (BotoCoreError, ClientError) as e:
+        app.logger.error(f"Querying stored readings failed: {e}")
+        ERROR_COUNT.inc()
+        return jsonify({"error": "Storage unavailable"}), 503
+
+    body = chain([first], lines) if first is not None else []
+    return Response(body, content_type="application/x-ndjson")
+
+
+@app.route("/store", methods=["POST"])
+def store():
+    """Uploads buffered readings to object storage now instead of waiting for the writer."""
+    if READINGS is None:
+        return jsonify({"error": "Storage not configured"}), 503
+
+    return jsonify({"stored": READINGS.flush()})
+
+
+def start_background_tasks():
+    """Starts the poller and, if storage is configured, the reading writer."""
+    # Refresh readings in the background so requests never wait on upstream
+    TEMPERATURE_POLLER.start()
+    if READINGS is not None:
+        READINGS.start()
+
+
+def stop_background_tasks():
+    """Stops background work and uploads readings still in the buffer."""
+    TEMPERATURE_POLLER.stop(timeout=5)
+    if READINGS is not None:
+        READINGS.stop(timeout=30)
 
 
 if __name__ == "__main__":
     # Start Prometheus metrics server in the background
-    start_http_server(8000)
-    app.run(host="0.0.0.0", port=5000)
+    start_http_server(int(os.getenv("METRICS_PORT", "8000")), registry=METRICS_REGISTRY)
+    start_background_tasks()
+    try:
+        app.run(host="0.0.0.0", port=5000)
+    finally:
+        stop_background_tasks()
@@ -0,0 +1,351 @@
+"""
+TTL cache with stale-while-revalidate, single-flight loading and pluggable storage.
+
+Fresh entries are served directly. Entries past their TTL but still inside the
+stale window are served immediately while one background refresh runs. Entries
+that are missing or too old are loaded synchronously, and concurrent misses for
+the same key wait on a single in-flight load instead of each calling upstream.
+
+Entries always live in this process. With a shared backend (``RedisBackend``,
+e.g. Valkey) they are also shared between workers and replicas, and a
+distributed lock makes sure only one of them refreshes an expired key. If the
+shared backend is unreachable the cache keeps working from process memory.
+"""
+
+import json
+import logging
+import math
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+
+import redis
+from prometheus_client import Counter
+
+logger = logging.getLogger(__name__)
+
+# Prometheus Metrics
+CACHE_HITS = Counter("cache_hits", "Number of cache lookups served from cache", ["cache"])
+CACHE_MISSES = Counter("cache_misses", "Number of cache lookups that loaded upstream", ["cache"])
+CACHE_COALESCED = Counter(
+    "cache_coalesced", "Number of cache misses merged into an in-flight load", ["cache"]
+)
+CACHE_BACKEND_ERRORS = Counter(
+    "cache_backend_errors", "Number of failed calls to the shared cache backend", ["cache"]
+)
+
+
+class CacheBackendError(Exception):
+    """Raised when a cache backend cannot be reached."""
+
+
+class _Entry:
+    """A cached value and the wall-clock time it was stored."""
+
+    __slots__ = ("value", "stored_at")
+
+    def __init__(self, value, stored_at):
+        self.value = value
+        self.stored_at = stored_at
+
+
+class _Flight:
+    """A load in progress that other callers can wait on."""
+
+    __slots__ = ("done", "entry", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.entry = None
+        self.error = None
+
+
+class CacheBackend(ABC):
+    """Storage for cache entries and refresh locks."""
+
+    @abstractmethod
+    def get(self, key):
+        """Return the _Entry stored for key, or None."""
+
+    @abstractmethod
+    def set(self, key, entry, expire):
+        """Store entry for key, dropping it after expire seconds."""
+
+    @abstractmethod
+    def acquire_lock(self, key, timeout):
+        """Take the refresh lock for key for up to timeout seconds; return a token or None."""
+
+    @abstractmethod
+    def release_lock(self, key, token):
+        """Release the refresh lock for key if it is still held with token."""
+
+    @abstractmethod
+    def clear(self):
+        """Drop all entries."""
+
+
+class MemoryBackend(CacheBackend):
+    """Entries held in a dict in this process."""
+
+    def __init__(self, clock=time.time):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._locks = {}
+
+    def get(self, key):
+        item = self._entries.get(key)
+        if item is None or item[1] <= self._clock():
+            return None
+        return item[0]
+
+    def set(self, key, entry, expire):
+        self._entries[key] = (entry, self._clock() + expire)
+
+    def acquire_lock(self, key, timeout):
+        with self._lock:
+            held = self._locks.get(key)
+            if held is not None and held[1] > self._clock():
+                return None
+            token = uuid.uuid4().hex
+            self._locks[key] = (token, self._clock() + timeout)
+            return token
+
+    def release_lock(self, key, token):
+        with self._lock:
+            if self._locks.get(key, (None,))[0] == token:
+                del self._locks[key]
+
+    def clear(self):
+        self._entries.clear()
+
+
+class RedisBackend(CacheBackend):
+    """Entries shared through a Redis-protocol server such as Valkey.
+
+    Values are stored as compact JSON ``[stored_at, value]`` and the refresh lock
+    is a ``SET NX PX`` key holding a random token.
+    """
+
+    def __init__(self, client, prefix="hivebox:cache:"):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url, max_connections=20, timeout=0.5, **kwargs):
+        """Backend using a pooled client with short timeouts, so outages fail fast."""
+        pool = redis.ConnectionPool.from_url(
+            url,
+            max_connections=max_connections,
+            socket_timeout=timeout,
+            socket_connect_timeout=timeout,
+        )
+        return cls(redis.Redis(connection_pool=pool), **kwargs)
+
+    def get(self, key):
+        try:
+            raw = self.client.get(self.prefix + key)
+        except redis.RedisError as e:
+            raise CacheBackendError(e) from e
+        if raw is None:
+            return None
+        stored_at, value = json.loads(raw)
+        return _Entry(value, stored_at)
+
+    def set(self, key, entry, expire):
+        raw = json.dumps([entry.stored_at, entry.value], separators=(",", ":"))
+        try:
+            self.client.set(self.prefix + key, raw, ex=max(1, math.ceil(expire)))
+        except redis.RedisError as e:
+            raise CacheBackendError(e) from e
+
+    def acquire_lock(self, key, timeout):
+        token = uuid.uuid4().hex
+        try:
+            acquired = self.client.set(
+                f"{self.prefix}lock:{key}", token, nx=True, px=int(timeout * 1000)
+            )
+        except redis.RedisError as e:
+            raise CacheBackendError(e) from e
+        return token if acquired else None
+
+    def release_lock(self, key, token):
+        lock_key = f"{self.prefix}lock:{key}"
+        try:
+            with self.client.pipeline() as pipe:
+                # Only delete the lock if it has not expired and been taken by someone else
+                pipe.watch(lock_key)
+                if pipe.get(lock_key) == token.encode():
+                    pipe.multi()
+                    pipe.delete(lock_key)
+                    pipe.execute()
+                else:
+                    pipe.unwatch()
+        except redis.WatchError:
+            pass
+        except redis.RedisError as e:
+            raise CacheBackendError(e) from e
+
+    def clear(self):
+        try:
+            keys = list(self.client.scan_iter(match=self.prefix + "*"))
+            if keys:
+                self.client.delete(*keys)
+        except redis.RedisError as e:
+            raise CacheBackendError(e) from e
+
+
+class TTLCache:
+    """Thread-safe TTL cache keyed by string, e.g. a location."""
+
+    def __init__(
+        self,
+        name,
+        ttl,
+        stale_ttl=0.0,
+        backend=None,
+        lock_timeout=30.0,
+        lock_wait=10.0,
+        retry_backend_after=5.0,
+        clock=time.time,
+    ):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.backend = backend
+        self.lock_timeout = lock_timeout
+        self.lock_wait = lock_wait
+        self.retry_backend_after = retry_backend_after
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._local = MemoryBackend(clock)
+        self._inflight = {}
+        self._backend_down_until = 0.0
+
+    def _backend_up(self):
+        """Whether there is a shared backend and it is not in its retry pause after an error."""
+        return self.backend is not None and time.monotonic() >= self._backend_down_until
+
+    def _shared(self, method, *args):
+        """Call a shared backend method; returns None if there is none or it is down."""
+        if not self._backend_up():
+            return None
+        try:
+            return getattr(self.backend, method)(*args)
+        except CacheBackendError as e:
+            CACHE_BACKEND_ERRORS.labels(self.name).inc()
+            logger.warning("Cache backend unavailable, using process memory: %s", e)
+            self._backend_down_until = time.monotonic() + self.retry_backend_after
+            return None
+
+    def _lookup(self, key):
+        """The newest entry for key, preferring a fresh local copy over a network call."""
+        entry = self._local.get(key)
+        if entry is not None and self._clock() - entry.stored_at < self.ttl:
+            return entry
+        shared = self._shared("get", key)
+        if shared is not None and (entry is None or shared.stored_at > entry.stored_at):
+            self._local.set(key, shared, self.ttl + self.stale_ttl)
+            return shared
+        return entry
+
+    def _store(self, key, value):
+        entry = _Entry(value, self._clock())
+        self._local.set(key, entry, self.ttl + self.stale_ttl)
+        self._shared("set", key, entry, self.ttl + self.stale_ttl)
+        return entry
+
+    def get(self, key, loader):
+        """Return the value for key, calling loader() at most once per refresh."""
+        return self.get_entry(key, loader)[0]
+
+    def get_entry(self, key, loader, serve_stale=True):
+        """Return (value, stored_at) for key; with serve_stale=False, stale entries are reloaded."""
+        entry = self._lookup(key)
+        age = self._clock() - entry.stored_at if entry else None
+
+        if entry is not None and age < self.ttl:
+            CACHE_HITS.labels(self.name).inc()
+            return entry.value, entry.stored_at
+
+        with self._lock:
+            if serve_stale and entry is not None and age < self.ttl + self.stale_ttl:
+                CACHE_HITS.labels(self.name).inc()
+                if key not in self._inflight:
+                    flight = self._inflight[key] = _Flight()
+                    threading.Thread(
+                        target=self._refresh, args=(key, loader, flight), daemon=True
+                    ).start()
+                return entry.value, entry.stored_at
+
+            flight = self._inflight.get(key)
+            if flight is not None:
+                CACHE_COALESCED.labels(self.name).inc()
+                leader = False
+            else:
+                CACHE_MISSES.labels(self.name).inc()
+                flight = self._inflight[key] = _Flight()
+                leader = True
+
+        if leader:
+            self._load(key, loader, flight)
+        else:
+            flight.done.wait()
+
+        if flight.error is not None:
+            raise flight.error
+        return flight.entry.value, flight.entry.stored_at
+
+    def _wait_for_peer(self, key):
+        """Poll the shared backend until another replica has stored a fresh entry.
+
+        Gives up early, returning None, if the backend fails while waiting.
+        """
+        deadline = time.monotonic() + self.lock_wait
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            entry = self._shared("get", key)
+            if entry is not None and self._clock() - entry.stored_at < self.ttl:
+                self._local.set(key, entry, self.ttl + self.stale_ttl)
+                return entry
+            if not self._backend_up():
+                # The peer's result can no longer arrive; load it ourselves now
+                return None
+        return None
+
+    def _load(self, key, loader, flight):
+        """Run loader() for key and wake up every caller waiting on the flight.
+
+        When another replica holds the refresh lock, wait for its result instead,
+        and only call loader() if none arrives within lock_wait.
+        """
+        token = None
+        try:
+            token = self._shared("acquire_lock", key, self.lock_timeout)
+            if token is None and self._backend_up():
+                # Another replica is refreshing this key
+                peer = self._wait_for_peer(key)
+                if peer is not None:
+                    flight.entry = peer
+                    return
+            flight.entry = self._store(key, loader())
+        except Exception as e:
+            flight.error = e
+        finally:
+            if token is not None:
+                self._shared("release_lock", key, token)
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.done.set()
+
+    def _refresh(self, key, loader, flight):
+        """Revalidate a stale entry in the background, keeping it on failure."""
+        self._load(key, loader, flight)
+        if flight.error is not None:
+            logger.warning("Background refresh of %s failed: %s", key, flight.error)
+
+    def clear(self):
+        """Drop all cached entries."""
+        self._local.clear()
+        self._shared("clear")
@@ -0,0 +1,2 @@
+class UpstreamError(Exception):
+    """Raised when the upstream API does not return a usable reading."""
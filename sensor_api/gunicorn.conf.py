@@ -0,0 +1,60 @@
+"""
+Gunicorn settings for serving the Sensor API in production.
+
+Start with: gunicorn -c sensor_api/gunicorn.conf.py sensor_api.app:app
+
+Workers use threads (gthread), so requests waiting on upstream I/O do not block
+a whole process. When PROMETHEUS_MULTIPROC_DIR is set, metrics from all workers
+are aggregated and served on port 8000 by the master process.
+"""
+
+import os
+import shutil
+
+from prometheus_client import CollectorRegistry, multiprocess, start_http_server
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("GUNICORN_WORKERS", "2"))
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+worker_class = "gthread"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+accesslog = os.getenv("GUNICORN_ACCESSLOG")  # "-" logs to stdout
+
+METRICS_PORT = int(os.getenv("METRICS_PORT", "8000"))
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+
+def on_starting(server):
+    """Start every run with an empty multiprocess metrics directory."""
+    if MULTIPROC_DIR:
+        shutil.rmtree(MULTIPROC_DIR, ignore_errors=True)
+        os.makedirs(MULTIPROC_DIR, exist_ok=True)
+
+
+def when_ready(server):
+    """Serve metrics aggregated across all workers."""
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        start_http_server(METRICS_PORT, registry=registry)
+
+
+def post_worker_init(worker):
+    """Refresh and store readings in the background of every worker."""
+    from sensor_api.app import start_background_tasks
+
+    start_background_tasks()
+
+
+def worker_exit(server, worker):
+    """Upload readings still buffered in the exiting worker."""
+    from sensor_api.app import stop_background_tasks
+
+    stop_background_tasks()
+
+
+def child_exit(server, worker):
+    """Drop live gauges of workers that have exited."""
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(worker.pid)
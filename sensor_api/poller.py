@@ -0,0 +1,139 @@
+"""
+Background poller that keeps an immutable snapshot of an upstream reading.
+
+A daemon thread calls the fetch function on a jittered interval and backs off
+exponentially while it keeps failing. Request handlers read ``Poller.snapshot``,
+which is replaced atomically and never blocks or performs I/O.
+"""
+
+import logging
+import random
+import threading
+import time
+from typing import Any, NamedTuple, Optional
+
+from prometheus_client import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+# Prometheus Metrics
+POLL_FAILURES = Counter("poller_failures", "Number of failed background polls", ["poller"])
+POLL_LAST_SUCCESS = Gauge(
+    "poller_last_success_timestamp_seconds",
+    "Unix time of the last successful background poll",
+    ["poller"],
+    multiprocess_mode="max",
+)
+
+
+class Snapshot(NamedTuple):
+    """The latest reading, when it was fetched and the error of the last poll, if any."""
+
+    value: Any
+    fetched_at: Optional[float]
+    error: Optional[str] = None
+
+    def age(self, now=None):
+        """Seconds since the reading was fetched, or None if there is no reading."""
+        if self.fetched_at is None:
+            return None
+        return (time.time() if now is None else now) - self.fetched_at
+
+
+class Poller:
+    """Polls fetch() in a background thread and publishes the result as a Snapshot.
+
+    With timestamped=True, fetch() returns (value, fetched_at) instead of a bare value,
+    for readings that may have been fetched earlier by someone else. Such a reading
+    may already be close to max_age old, so the next poll is brought forward to when
+    it reaches max_age rather than a full interval later.
+    """
+
+    def __init__(
+        self,
+        name,
+        fetch,
+        interval,
+        jitter=0.1,
+        backoff=5.0,
+        max_backoff=None,
+        timestamped=False,
+        max_age=None,
+        clock=time.time,
+    ):
+        self.name = name
+        self.fetch = fetch
+        self.timestamped = timestamped
+        self.max_age = max_age
+        self._clock = clock
+        self.interval = interval
+        self.jitter = jitter
+        self.backoff = backoff
+        self.max_backoff = interval if max_backoff is None else max_backoff
+        self.snapshot = None
+        self._failures = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        """Whether the background thread is alive."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def poll_once(self):
+        """Fetch a new reading and publish it, keeping the previous reading on failure."""
+        try:
+            if self.timestamped:
+                value, fetched_at = self.fetch()
+            else:
+                value, fetched_at = self.fetch(), self._clock()
+        except Exception as e:
+            self._failures += 1
+            POLL_FAILURES.labels(self.name).inc()
+            logger.warning("Polling %s failed: %s", self.name, e)
+            previous = self.snapshot
+            if previous is None:
+                self.snapshot = Snapshot(None, None, str(e))
+            else:
+                self.snapshot = previous._replace(error=str(e))
+            return False
+
+        self._failures = 0
+        self.snapshot = Snapshot(value, fetched_at)
+        POLL_LAST_SUCCESS.labels(self.name).set(self.snapshot.fetched_at)
+        return True
+
+    def next_delay(self):
+        """Seconds until the next poll: the jittered interval, or backoff after failures.
+
+        With max_age set, the delay is at most the reading's remaining freshness
+        plus jitter, so a reading fetched earlier elsewhere is replaced on time.
+        """
+        if self._failures:
+            delay = min(self.max_backoff, self.backoff * 2 ** (self._failures - 1))
+            return random.uniform(delay / 2, delay)
+        delay = self.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+        if self.max_age is not None and self.snapshot is not None:
+            remaining = max(0.0, self.max_age - self.snapshot.age(self._clock()))
+            delay = min(delay, remaining + self.interval * random.uniform(0, self.jitter))
+        return delay
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.poll_once()
+            self._stop.wait(self.next_delay())
+
+    def start(self):
+        """Start polling in a daemon thread; the first poll happens immediately."""
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"poller-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """Stop the background thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
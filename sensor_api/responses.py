@@ -0,0 +1,59 @@
+"""
+Pre-encoded JSON responses with strong ETags and conditional GET.
+
+A body is serialized and hashed once per data change (``CachedBody``), then
+served as bytes on every request. Clients and the ingress that send the ETag
+back in ``If-None-Match`` get an empty 304 instead, so polling an unchanged
+endpoint costs neither JSON encoding nor transfer.
+"""
+
+import hashlib
+import json
+
+from flask import Response, request
+
+
+class CachedBody:
+    """A JSON payload encoded once, with the strong ETag of its bytes."""
+
+    __slots__ = ("body", "etag")
+
+    def __init__(self, payload):
+        self.body = json.dumps(payload, separators=(",", ":")).encode()
+        self.etag = hashlib.sha1(self.body).hexdigest()
+
+
+class BodyCache:
+    """Remembers the encoded body of the last data object it was given.
+
+    Bodies are rebuilt only when a different object comes in, e.g. a new poller
+    snapshot or cache entry, so the data must be replaced rather than mutated.
+    """
+
+    def __init__(self, build):
+        self._build = build
+        self._last = (None, None)
+
+    def get(self, data):
+        """The CachedBody of build(data), encoding it only if data changed."""
+        last_data, cached = self._last
+        if last_data is not data:
+            cached = CachedBody(self._build(data))
+            # A single tuple swap, so concurrent requests at worst encode twice
+            self._last = (data, cached)
+        return cached
+
+
+def conditional_response(cached, max_age, age=0):
+    """Serves cached, or an empty 304 if the client already has it.
+
+    The data stays fresh for max_age seconds and is already age seconds old, so
+    clients and caches may keep it for the remaining max_age - age seconds.
+    """
+    headers = {
+        "ETag": f'"{cached.etag}"',
+        "Cache-Control": f"public, max-age={max(0, int(max_age - age))}",
+    }
+    if request.if_none_match.contains_weak(cached.etag):
+        return Response(status=304, headers=headers)
+    return Response(cached.body, headers=headers, content_type="application/json")
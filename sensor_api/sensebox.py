@@ -0,0 +1,119 @@
+"""
+Average temperature across many senseBoxes from the openSenseMap API.
+
+Boxes are fetched concurrently on a bounded thread pool sharing one pooled
+``UpstreamClient``. Readings older than ``max_age`` are dropped, and boxes that
+time out, fail or miss the overall ``deadline`` are skipped so the average
+degrades instead of failing.
+"""
+
+import logging
+import math
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, as_completed
+from datetime import datetime
+from typing import NamedTuple
+
+from sensor_api.errors import UpstreamError
+from sensor_api.upstream import UpstreamClient
+
+logger = logging.getLogger(__name__)
+
+SENSEBOX_API = "https://api.opensensemap.org"
+
+
+class Aggregate(NamedTuple):
+    """Average temperature and how many of the configured boxes contributed to it."""
+
+    temperature_celsius: float
+    boxes_contributing: int
+    boxes_total: int
+
+
+def parse_temperature(box, now, max_age):
+    """Returns the box's latest temperature, or None if it has none newer than max_age."""
+    for sensor in box.get("sensors", []):
+        if sensor.get("unit") != "°C":
+            continue
+        measurement = sensor.get("lastMeasurement") or {}
+        if "value" not in measurement or "createdAt" not in measurement:
+            continue
+        created_at = datetime.fromisoformat(measurement["createdAt"].replace("Z", "+00:00"))
+        if now - created_at.timestamp() > max_age:
+            return None
+        return float(measurement["value"])
+    return None
+
+
+class SenseBoxAggregator:
+    """Fetches a fixed set of senseBoxes concurrently and averages their temperatures."""
+
+    def __init__(
+        self,
+        box_ids,
+        base_url=SENSEBOX_API,
+        max_workers=32,
+        timeout=5,
+        max_age=3600,
+        retries=1,
+        deadline=10,
+        **client_settings,
+    ):
+        self.box_ids = list(box_ids)
+        self.base_url = base_url.rstrip("/")
+        self.max_age = max_age
+        self.deadline = deadline
+
+        workers = max(1, min(max_workers, len(self.box_ids)))
+        # All boxes share one circuit breaker, so it may only open once a whole
+        # round of boxes failed in a row, not because a few boxes are broken
+        client_settings["failure_threshold"] = max(
+            client_settings.get("failure_threshold", 5), len(self.box_ids)
+        )
+        self.client = UpstreamClient(
+            "sensebox", pool_size=workers, timeout=timeout, retries=retries, **client_settings
+        )
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sensebox")
+
+    def fetch_box(self, box_id, now):
+        """Fetches one box and returns its recent temperature, or None."""
+        response = self.client.get(f"{self.base_url}/boxes/{box_id}", params={"format": "json"})
+        response.raise_for_status()
+        return parse_temperature(response.json(), now, self.max_age)
+
+    def aggregate(self):
+        """Returns the mean of the recent box temperatures that arrive within the deadline.
+
+        Fails only if there are none.
+        """
+        now = time.time()
+        futures = {
+            self._pool.submit(self.fetch_box, box_id, now): box_id for box_id in self.box_ids
+        }
+
+        temperatures = array("d")
+        try:
+            for future in as_completed(futures, timeout=self.deadline):
+                try:
+                    temp = future.result()
+                except Exception as e:
+                    logger.warning("Skipping senseBox %s: %s", futures[future], e)
+                    continue
+                if temp is not None:
+                    temperatures.append(temp)
+        except TimeoutError:
+            # Average what arrived in time; boxes not started yet are dropped
+            late = [future for future in futures if not future.done()]
+            for future in late:
+                future.cancel()
+            logger.warning(
+                "Skipping %d senseBoxes that did not answer within %s s", len(late), self.deadline
+            )
+
+        if not temperatures:
+            raise UpstreamError("No senseBox reported a recent temperature")
+
+        return Aggregate(
+            math.fsum(temperatures) / len(temperatures), len(temperatures), len(self.box_ids)
+        )
@@ -0,0 +1,208 @@
+"""
+Rolling-window statistics over recent readings.
+
+Samples are kept in one fixed-size ring made of two ``array('d')`` (timestamps
+and values). Every window (e.g. 5 min, 1 h, 24 h) keeps incremental aggregates
+that are updated as samples enter and leave it, so queries never rescan the
+history:
+
+- count, sum and the sums needed for a least-squares trend: O(1)
+- min and max through monotonic deques: O(1) amortized
+- percentiles through a Fenwick tree of value counts in ``resolution`` wide
+  bins between ``low`` and ``high``: O(log bins)
+
+The trend sums use timestamps relative to an origin. Each time the ring wraps,
+the origin moves to the oldest sample still in a window and the sums are
+recomputed, and a window's sums restart at zero whenever it empties. That keeps
+``t**2`` small and stops rounding errors from adding up on a long-running pod,
+at the cost of one O(capacity) rescan per ``capacity`` samples.
+
+Percentiles are the centre of their bin, clamped to the window's min and max,
+so they are accurate to ``resolution / 2`` and never outside the observed range.
+
+Memory is bounded by the constructor arguments:
+
+- the ring: 16 bytes per sample of ``capacity``
+- per window, the Fenwick tree: 8 bytes per bin
+- the deques: their entries are sequence numbers (about 32 bytes each, shared
+  by all windows), and the two deques of a window together hold at most
+  ``capacity + 1`` of them, since the min deque only grows while values rise
+  and the max deque only while they fall. That is 8 bytes per entry and window
+  on top of the shared numbers.
+
+With the defaults (8640 samples, 3 windows, 1400 bins) that is about 0.2 MB
+for the ring and trees, plus up to 0.5 MB for the deques in the worst case of
+steadily rising or falling readings.
+"""
+
+import math
+import threading
+import time
+from array import array
+from collections import deque
+
+PERCENTILES = (50, 90, 99)
+
+
+def parse_window(spec):
+    """Seconds in a window spec such as '300', '5m', '1h' or '1d'."""
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    if spec[-1] in units:
+        return float(spec[:-1]) * units[spec[-1]]
+    return float(spec)
+
+
+class _Window:
+    """Incremental aggregates of the samples no older than span seconds."""
+
+    def __init__(self, span, bins):
+        self.span = span
+        self.tail = 0  # sequence number of the oldest sample in the window
+        self.count = 0
+        self.sum_v = self.sum_t = self.sum_tt = self.sum_tv = 0.0
+        self.min_q = deque()
+        self.max_q = deque()
+        self.tree = array("q", bytes(8 * (bins + 1)))
+
+
+class TimeSeriesStore:
+    """Fixed-size history of readings with rolling-window statistics."""
+
+    def __init__(self, windows, capacity=8640, low=-60.0, high=80.0, resolution=0.1):
+        self.capacity = capacity
+        self.low = low
+        self.resolution = resolution
+        self.bins = int(math.ceil((high - low) / resolution))
+        self._times = array("d", bytes(8 * capacity))
+        self._values = array("d", bytes(8 * capacity))
+        self._seq = 0  # sequence number of the next sample
+        self._origin = None  # trend timestamps are relative to this; see _rebase()
+        self._lock = threading.Lock()
+        self.windows = {name: _Window(span, self.bins) for name, span in windows.items()}
+
+    def _bin(self, value):
+        return min(self.bins - 1, max(0, int((value - self.low) / self.resolution)))
+
+    def _tree_add(self, tree, index, delta):
+        index += 1
+        while index <= self.bins:
+            tree[index] += delta
+            index += index & -index
+
+    def _tree_find(self, tree, rank):
+        """Smallest bin whose cumulative count reaches rank."""
+        pos = 0
+        step = 1 << self.bins.bit_length()
+        while step:
+            if pos + step <= self.bins and tree[pos + step] < rank:
+                pos += step
+                rank -= tree[pos]
+            step >>= 1
+        return pos
+
+    def _evict(self, window):
+        """Remove the oldest sample from window."""
+        seq = window.tail
+        slot = seq % self.capacity
+        t, v = self._times[slot] - self._origin, self._values[slot]
+        window.count -= 1
+        window.sum_v -= v
+        window.sum_t -= t
+        window.sum_tt -= t * t
+        window.sum_tv -= t * v
+        self._tree_add(window.tree, self._bin(v), -1)
+        if window.min_q and window.min_q[0] == seq:
+            window.min_q.popleft()
+        if window.max_q and window.max_q[0] == seq:
+            window.max_q.popleft()
+        window.tail += 1
+        if not window.count:
+            # Start over from exact zeros instead of keeping the rounding residue
+            window.sum_v = window.sum_t = window.sum_tt = window.sum_tv = 0.0
+
+    def _rebase(self):
+        """Move the origin to the oldest sample in any window and recompute the sums."""
+        held = [window.tail for window in self.windows.values() if window.count]
+        self._origin = self._times[min(held) % self.capacity] if held else None
+        for window in self.windows.values():
+            window.sum_v = window.sum_t = window.sum_tt = window.sum_tv = 0.0
+            for seq in range(window.tail, window.tail + window.count):
+                t = self._times[seq % self.capacity] - self._origin
+                v = self._values[seq % self.capacity]
+                window.sum_v += v
+                window.sum_t += t
+                window.sum_tt += t * t
+                window.sum_tv += t * v
+
+    def _expire(self, now):
+        for window in self.windows.values():
+            while window.count and self._times[window.tail % self.capacity] < now - window.span:
+                self._evict(window)
+
+    def add(self, value, timestamp=None):
+        """Record a reading; readings not newer than the last one are ignored."""
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            if self._seq and timestamp <= self._times[(self._seq - 1) % self.capacity]:
+                return
+
+            # The slot about to be overwritten must leave every window first
+            oldest = self._seq - self.capacity
+            for window in self.windows.values():
+                if window.count and window.tail == oldest:
+                    self._evict(window)
+            self._expire(timestamp)
+
+            if self._seq and self._seq % self.capacity == 0:
+                self._rebase()
+            if not any(window.count for window in self.windows.values()):
+                self._origin = timestamp
+
+            seq = self._seq
+            slot = seq % self.capacity
+            self._times[slot] = timestamp
+            self._values[slot] = value
+            self._seq += 1
+
+            t = timestamp - self._origin
+            for window in self.windows.values():
+                if not window.count:
+                    window.tail = seq
+                window.count += 1
+                window.sum_v += value
+                window.sum_t += t
+                window.sum_tt += t * t
+                window.sum_tv += t * value
+                self._tree_add(window.tree, self._bin(value), 1)
+                while window.min_q and self._values[window.min_q[-1] % self.capacity] >= value:
+                    window.min_q.pop()
+                window.min_q.append(seq)
+                while window.max_q and self._values[window.max_q[-1] % self.capacity] <= value:
+                    window.max_q.pop()
+                window.max_q.append(seq)
+
+    def stats(self, name, now=None):
+        """Count, min, max, mean, percentiles and trend (°C per hour) of window name."""
+        with self._lock:
+            self._expire(time.time() if now is None else now)
+            window = self.windows[name]
+            n = window.count
+            result = {"window_seconds": window.span, "count": n}
+            if not n:
+                return result
+
+            low = result["min"] = self._values[window.min_q[0] % self.capacity]
+            high = result["max"] = self._values[window.max_q[0] % self.capacity]
+            result["mean"] = window.sum_v / n
+            for pct in PERCENTILES:
+                index = self._tree_find(window.tree, max(1, math.ceil(pct / 100 * n)))
+                centre = round(self.low + (index + 0.5) * self.resolution, 6)
+                result[f"p{pct}"] = min(high, max(low, centre))
+
+            denominator = n * window.sum_tt - window.sum_t**2
+            if n > 1 and denominator > 1e-9:
+                slope = (n * window.sum_tv - window.sum_t * window.sum_v) / denominator
+                result["trend_per_hour"] = slope * 3600
+            else:
+                result["trend_per_hour"] = None
+            return result
@@ -0,0 +1,228 @@
+"""
+Buffered persistence of readings to an S3-compatible bucket such as MinIO.
+
+Readings are appended to an in-memory ring buffer, so callers never wait on
+storage. A background writer drains the buffer every ``flush_interval`` seconds,
+or sooner once ``batch_size`` readings are waiting, and uploads them as gzipped
+newline-delimited JSON chunks partitioned by UTC date and hour:
+
+    readings/date=2025-03-18/hour=14/<first ts>-<last ts>-<id>.ndjson.gz
+
+Chunk names carry their time range in whole seconds, rounded outwards so that
+it always covers the readings inside. Range queries only download the chunks
+that overlap the requested window. While storage is unreachable, readings stay
+in the buffer and the writer keeps retrying.
+"""
+
+import gzip
+import json
+import logging
+import math
+import threading
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from itertools import groupby
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
+from prometheus_client import Counter
+
+logger = logging.getLogger(__name__)
+
+# Prometheus Metrics
+READINGS_STORED = Counter("readings_stored", "Number of readings written to object storage")
+READINGS_DROPPED = Counter("readings_dropped", "Number of readings dropped from a full buffer")
+STORAGE_ERRORS = Counter("storage_errors", "Number of failed object storage uploads")
+
+
+def hour_of(timestamp):
+    """UTC datetime of the start of the hour containing timestamp."""
+    return datetime.fromtimestamp(timestamp, timezone.utc).replace(
+        minute=0, second=0, microsecond=0
+    )
+
+
+class ReadingStore:
+    """Ring buffer of readings with a background writer to an S3-compatible bucket.
+
+    Each reading is a dict with a "timestamp" key in Unix seconds.
+    """
+
+    def __init__(
+        self,
+        client,
+        bucket,
+        buffer_size=10000,
+        batch_size=1000,
+        flush_interval=300,
+        prefix="readings",
+    ):
+        self.client = client
+        self.bucket = bucket
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.prefix = prefix
+        self._buffer = deque(maxlen=buffer_size)
+        # Held only for single buffer updates, so that drops are counted exactly
+        self._buffer_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._bucket_ready = False
+
+    @classmethod
+    def from_endpoint(
+        cls,
+        endpoint_url,
+        access_key=None,
+        secret_key=None,
+        connect_timeout=1.0,
+        read_timeout=5.0,
+        max_attempts=2,
+        **kwargs,
+    ):
+        """Store using an S3 client with short timeouts and few retries, so outages fail fast.
+
+        botocore's defaults (60 s timeouts, 5 attempts) would hold a request
+        thread for minutes while storage is unreachable.
+        """
+        client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            aws_access_key_id=access_key,
+            aws_secret_access_key=secret_key,
+            config=Config(
+                connect_timeout=connect_timeout,
+                read_timeout=read_timeout,
+                retries={"total_max_attempts": max_attempts, "mode": "standard"},
+            ),
+        )
+        return cls(client, **kwargs)
+
+    def append(self, reading):
+        """Buffer a reading; the oldest one is dropped if the buffer is full."""
+        with self._buffer_lock:
+            if len(self._buffer) == self._buffer.maxlen:
+                READINGS_DROPPED.inc()
+            self._buffer.append(reading)
+        if len(self._buffer) >= self.batch_size:
+            self._wake.set()
+
+    def ensure_bucket(self):
+        """Create the bucket if it does not exist yet; returns False if storage is unreachable."""
+        try:
+            try:
+                self.client.head_bucket(Bucket=self.bucket)
+            except ClientError:
+                self.client.create_bucket(Bucket=self.bucket)
+        except (BotoCoreError, ClientError) as e:
+            STORAGE_ERRORS.inc()
+            logger.error("Bucket %s is not available: %s", self.bucket, e)
+            return False
+        return True
+
+    def _chunk_key(self, readings):
+        first, last = readings[0]["timestamp"], readings[-1]["timestamp"]
+        hour = hour_of(first)
+        return (
+            f"{self.prefix}/date={hour:%Y-%m-%d}/hour={hour:%H}/"
+            f"{math.floor(first)}-{math.ceil(last)}-{uuid.uuid4().hex[:8]}.ndjson.gz"
+        )
+
+    def _upload(self, readings):
+        body = gzip.compress(
+            b"".join(json.dumps(r, separators=(",", ":")).encode() + b"\n" for r in readings)
+        )
+        self.client.put_object(
+            Bucket=self.bucket,
+            Key=self._chunk_key(readings),
+            Body=body,
+            ContentType="application/x-ndjson",
+            ContentEncoding="gzip",
+        )
+
+    def _requeue(self, readings):
+        """Put unsent readings back in front of the buffer to retry on the next flush.
+
+        Readings appended during the upload are newer, so if they do not all fit
+        the oldest of the unsent ones are dropped, as append() would have done.
+        """
+        with self._buffer_lock:
+            dropped = max(0, len(readings) - (self._buffer.maxlen - len(self._buffer)))
+            if dropped:
+                READINGS_DROPPED.inc(dropped)
+                logger.warning("Buffer full, dropping %d unsent readings", dropped)
+            self._buffer.extendleft(reversed(readings[dropped:]))
+
+    def flush(self):
+        """Upload every buffered reading and return how many were stored."""
+        stored = 0
+        with self._flush_lock:
+            while self._buffer:
+                batch = []
+                while self._buffer and len(batch) < self.batch_size:
+                    batch.append(self._buffer.popleft())
+                batch.sort(key=lambda r: r["timestamp"])
+
+                chunks = [list(g) for _, g in groupby(batch, key=lambda r: hour_of(r["timestamp"]))]
+                for i, chunk in enumerate(chunks):
+                    try:
+                        self._upload(chunk)
+                    except Exception as e:
+                        STORAGE_ERRORS.inc()
+                        logger.error("Storing %d readings failed: %s", len(chunk), e)
+                        unsent = [reading for rest in chunks[i:] for reading in rest]
+                        self._requeue(unsent)
+                        return stored
+                    stored += len(chunk)
+                    READINGS_STORED.inc(len(chunk))
+        return stored
+
+    def query(self, start, end):
+        """Yield stored readings with start <= timestamp < end as NDJSON lines."""
+        hour = hour_of(start)
+        while hour.timestamp() < end:
+            prefix = f"{self.prefix}/date={hour:%Y-%m-%d}/hour={hour:%H}/"
+            paginator = self.client.get_paginator("list_objects_v2")
+            for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+                for obj in sorted(page.get("Contents", []), key=lambda o: o["Key"]):
+                    first, last = map(float, obj["Key"].rsplit("/", 1)[1].split("-")[:2])
+                    if last < start or first >= end:
+                        continue
+                    body = self.client.get_object(Bucket=self.bucket, Key=obj["Key"])["Body"]
+                    with gzip.GzipFile(fileobj=body) as lines:
+                        for line in lines:
+                            if start <= json.loads(line)["timestamp"] < end:
+                                yield line
+            hour = hour_of(hour.timestamp() + 3600)
+
+    def _run(self):
+        while not self._stop.is_set():
+            # Storage may come up after the API, so the bucket is set up here
+            # rather than at startup and retried until it succeeds
+            if not self._bucket_ready:
+                self._bucket_ready = self.ensure_bucket()
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            if self._bucket_ready:
+                self.flush()
+
+    def start(self):
+        """Start the background writer, which also creates the bucket if needed."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="reading-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """Stop the background writer and upload what is left in the buffer."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
@@ -1,7 +1,32 @@
+import json
 import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
 import unittest
-from unittest.mock import patch
-from sensor_api.app import app
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import PropertyMock, patch
+import boto3
+from moto import mock_aws
+from prometheus_client import REGISTRY
+from sensor_api.app import (
+    app,
+    fetch_temperature,
+    OPENWEATHER,
+    TEMPERATURE_CACHE,
+    TEMPERATURE_POLLER,
+)
+from sensor_api.poller import Poller, Snapshot
+from sensor_api.sensebox import Aggregate
+from sensor_api.stats import TimeSeriesStore
+from sensor_api.storage import ReadingStore
+
+
+def max_age(response):
+    """Seconds a response may be cached for, from its Cache-Control header."""
+    return response.cache_control.max_age
 
 
 class TestSensorAPI(unittest.TestCase):
@@ -10,8 +35,9 @@ class TestSensorAPI(unittest.TestCase):
     def setUp(self):
         self.client = app.test_client()
         os.environ["OPENWEATHER_API_KEY"] = "test_api_key"
+        TEMPERATURE_CACHE.clear()
 
-    @patch("sensor_api.app.requests.get")
+    @patch.object(OPENWEATHER.session, "get")
     def test_temperature_endpoint(self, mock_get):
         """Test different temperature values from OpenWeather API."""
         mock_get.return_value.status_code = 200
@@ -21,15 +47,29 @@ class TestSensorAPI(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.json["status"], "Good")
 
+        TEMPERATURE_CACHE.clear()
         mock_get.return_value.json.return_value = {"main": {"temp": 5}}
         response = self.client.get("/temperature")
         self.assertEqual(response.json["status"], "Too Cold")
 
+        TEMPERATURE_CACHE.clear()
         mock_get.return_value.json.return_value = {"main": {"temp": 40}}
         response = self.client.get("/temperature")
         self.assertEqual(response.json["status"], "Too Hot")
 
-    @patch("sensor_api.app.requests.get")
+    @patch.object(OPENWEATHER.session, "get")
+    def test_city_is_url_encoded(self, mock_get):
+        """Test that the city is passed as an encoded query parameter, not pasted into the URL."""
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.json.return_value = {"main": {"temp": 25}}
+
+        fetch_temperature("test_api_key", "São Paulo & more")
+        self.assertEqual(
+            mock_get.call_args.kwargs["params"],
+            {"q": "São Paulo & more", "appid": "test_api_key", "units": "metric"},
+        )
+
+    @patch.object(OPENWEATHER.session, "get")
     def test_temperature_invalid_api_response(self, mock_get):
         """Test handling when OpenWeather API returns unexpected response."""
         mock_get.return_value.status_code = 200
@@ -48,3 +88,284 @@ class TestSensorAPI(unittest.TestCase):
         self.assertEqual(
             response.json["error"], "API key missing"
         )  # Ensure correct message
+
+    @patch.object(OPENWEATHER.session, "get")
+    def test_temperature_is_cached(self, mock_get):
+        """Test that repeated requests are served from cache."""
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.json.return_value = {"main": {"temp": 15}}
+
+        self.client.get("/temperature")
+        response = self.client.get("/temperature")
+        self.assertEqual(response.json["temperature_celsius"], 15)
+        self.assertEqual(mock_get.call_count, 1)
+
+    @patch.object(OPENWEATHER.session, "get")
+    def test_temperature_conditional_get(self, mock_get):
+        """Test that an unchanged reading is answered with 304 for its ETag."""
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.json.return_value = {"main": {"temp": 15}}
+
+        response = self.client.get("/temperature")
+        etag = response.headers["ETag"]
+        self.assertIn(max_age(response), (299, 300))
+
+        response = self.client.get("/temperature", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b"")
+        self.assertEqual(response.headers["ETag"], etag)
+
+        TEMPERATURE_CACHE.clear()
+        mock_get.return_value.json.return_value = {"main": {"temp": 16}}
+        response = self.client.get("/temperature", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["ETag"], etag)
+
+    def test_health(self):
+        """Test that /health answers without touching upstream."""
+        response = self.client.get("/health")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json, {"status": "ok"})
+
+    @patch.object(OPENWEATHER.session, "get")
+    def test_temperature_concurrent_requests_coalesced(self, mock_get):
+        """Test that 100 parallel requests lead to a single upstream call."""
+        calls = []
+        barrier = threading.Barrier(100)
+
+        def slow_get(*args, **kwargs):
+            calls.append(args)
+            time.sleep(0.5)
+            return mock_get.return_value
+
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.json.return_value = {"main": {"temp": 15}}
+        mock_get.side_effect = slow_get
+
+        def request(_):
+            client = app.test_client()
+            barrier.wait()
+            return client.get("/temperature").status_code
+
+        with ThreadPoolExecutor(max_workers=100) as pool:
+            statuses = list(pool.map(request, range(100)))
+
+        self.assertEqual(statuses, [200] * 100)
+        self.assertEqual(len(calls), 1)
+
+    @patch("sensor_api.app.SENSEBOX")
+    def test_temperature_from_sensebox(self, mock_sensebox):
+        """Test that the senseBox average reports how many boxes contributed."""
+        mock_sensebox.aggregate.return_value = Aggregate(21.5, 8, 10)
+
+        response = self.client.get("/temperature")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json["temperature_celsius"], 21.5)
+        self.assertEqual(response.json["boxes_contributing"], 8)
+        self.assertEqual(response.json["boxes_total"], 10)
+        self.assertEqual(response.json["status"], "Good")
+
+    @patch(
+        "sensor_api.app.TEMPERATURE_STATS",
+        TimeSeriesStore({"5m": 300, "1h": 3600, "24h": 86400}),
+    )
+    @patch.object(OPENWEATHER.session, "get")
+    def test_temperature_stats(self, mock_get):
+        """Test that fetched readings show up in the rolling statistics."""
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.json.return_value = {"main": {"temp": 15}}
+        self.client.get("/temperature")
+
+        response = self.client.get("/temperature/stats")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json), {"5m", "1h", "24h"})
+
+        response = self.client.get("/temperature/stats?window=1h")
+        self.assertEqual(response.json["1h"]["window_seconds"], 3600)
+        self.assertEqual(response.json["1h"]["count"], 1)
+        self.assertEqual(response.json["1h"]["max"], 15)
+
+    def test_temperature_stats_unknown_window(self):
+        """Test that an unconfigured window returns 400."""
+        response = self.client.get("/temperature/stats?window=7d")
+        self.assertEqual(response.status_code, 400)
+
+    @patch("sensor_api.app.TOO_HOT_ABOVE", 25.0)
+    @patch.object(OPENWEATHER.session, "get")
+    def test_temperature_thresholds_configurable(self, mock_get):
+        """Test that the status uses the configured thresholds."""
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.json.return_value = {"main": {"temp": 28}}
+
+        response = self.client.get("/temperature")
+        self.assertEqual(response.json["status"], "Too Hot")
+
+    @patch.object(OPENWEATHER.session, "get")
+    def test_request_instrumentation(self, mock_get):
+        """Test that requests are timed by route and status and leave the in-flight gauge."""
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.json.return_value = {"main": {"temp": 15}}
+        labels = {"endpoint": "/temperature", "method": "GET", "status": "200"}
+        before = REGISTRY.get_sample_value("http_request_duration_seconds_count", labels) or 0
+
+        self.client.get("/temperature")
+        self.client.get("/no-such-path")
+
+        after = REGISTRY.get_sample_value("http_request_duration_seconds_count", labels)
+        self.assertEqual(after, before + 1)
+        unmatched = {"endpoint": "unmatched", "method": "GET", "status": "404"}
+        self.assertGreaterEqual(
+            REGISTRY.get_sample_value("http_request_duration_seconds_count", unmatched), 1
+        )
+        in_flight = REGISTRY.get_sample_value(
+            "http_requests_in_flight", {"endpoint": "/temperature"}
+        )
+        self.assertEqual(in_flight, 0)
+
+    def test_metrics_multiprocess_mode(self):
+        """Test that /metrics aggregates worker files when PROMETHEUS_MULTIPROC_DIR is set."""
+        with tempfile.TemporaryDirectory() as multiproc_dir:
+            env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=multiproc_dir)
+            # A worker process writes its metrics to the directory
+            worker = "from prometheus_client import Counter; Counter('worker_probe', 'x').inc(3)"
+            subprocess.run([sys.executable, "-c", worker], env=env, check=True)
+
+            with patch.dict(os.environ, {"PROMETHEUS_MULTIPROC_DIR": multiproc_dir}):
+                response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith("text/plain"))
+        self.assertIn("worker_probe_total 3.0", response.get_data(as_text=True))
+
+
+@mock_aws
+class TestSensorAPIStorage(unittest.TestCase):
+    """Tests for storing fetched readings and reading them back."""
+
+    def setUp(self):
+        self.client = app.test_client()
+        os.environ["OPENWEATHER_API_KEY"] = "test_api_key"
+        TEMPERATURE_CACHE.clear()
+        self.store = ReadingStore(boto3.client("s3", region_name="us-east-1"), "sensor-data")
+        self.store.ensure_bucket()
+        patcher = patch("sensor_api.app.READINGS", self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch.object(OPENWEATHER.session, "get")
+    def test_fetched_readings_are_stored_and_queried(self, mock_get):
+        """Test that a fetched reading is stored by /store and returned by /readings."""
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.json.return_value = {"main": {"temp": 15}}
+        self.client.get("/temperature")
+
+        response = self.client.post("/store")
+        self.assertEqual(response.json, {"stored": 1})
+
+        response = self.client.get("/readings")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content_type, "application/x-ndjson")
+        readings = [json.loads(line) for line in response.data.splitlines()]
+        self.assertEqual(len(readings), 1)
+        self.assertEqual(readings[0]["temperature_celsius"], 15)
+
+    def test_readings_rejects_invalid_range(self):
+        """Test that an unparseable start time returns 400."""
+        response = self.client.get("/readings?start=yesterday")
+        self.assertEqual(response.status_code, 400)
+
+    def test_readings_rejects_unbounded_range(self):
+        """Test that non-finite, reversed and too long ranges return 400 before any listing."""
+        for query in (
+            "start=nan",
+            "end=inf",
+            "end=1e20",
+            "start=2000&end=1000",
+            "start=0&end=864000",
+        ):
+            with self.subTest(query=query):
+                response = self.client.get(f"/readings?{query}")
+                self.assertEqual(response.status_code, 400)
+
+    def test_readings_missing_bucket(self):
+        """Test that a storage error is a 503 instead of a broken stream."""
+        store = ReadingStore(self.store.client, "no-such-bucket")
+        with patch("sensor_api.app.READINGS", store):
+            response = self.client.get("/readings")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json["error"], "Storage unavailable")
+
+    def test_readings_without_storage(self):
+        """Test that storage endpoints return 503 when storage is not configured."""
+        with patch("sensor_api.app.READINGS", None):
+            self.assertEqual(self.client.get("/readings").status_code, 503)
+            self.assertEqual(self.client.post("/store").status_code, 503)
+
+
+@patch.object(Poller, "running", new_callable=PropertyMock, return_value=True)
+class TestSensorAPIWithPoller(unittest.TestCase):
+    """Tests for /temperature when readings come from the background poller."""
+
+    def setUp(self):
+        self.client = app.test_client()
+
+    def tearDown(self):
+        TEMPERATURE_POLLER.snapshot = None
+
+    @patch.object(OPENWEATHER.session, "get")
+    def test_temperature_served_from_snapshot(self, mock_get, _running):
+        """Test that requests read the snapshot without calling upstream."""
+        TEMPERATURE_POLLER.snapshot = Snapshot({"temperature_celsius": 15}, time.time() - 30)
+
+        response = self.client.get("/temperature")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json["status"], "Good")
+        # Fresh for the rest of the 300 s poll interval
+        self.assertIn(max_age(response), (269, 270))
+        self.assertNotIn("stale", response.json)
+        mock_get.assert_not_called()
+
+    def test_temperature_snapshot_etag(self, _running):
+        """Test that the ETag changes with the snapshot, not with every request."""
+        TEMPERATURE_POLLER.snapshot = Snapshot({"temperature_celsius": 15}, time.time())
+        etag = self.client.get("/temperature").headers["ETag"]
+
+        response = self.client.get("/temperature", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+
+        TEMPERATURE_POLLER.snapshot = TEMPERATURE_POLLER.snapshot._replace(error="timeout")
+        response = self.client.get("/temperature", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json["stale"])
+
+    def test_temperature_reports_age_when_source_down(self, _running):
+        """Test that a failing source still serves the last reading, stale and with its time."""
+        fetched_at = time.time() - 600
+        TEMPERATURE_POLLER.snapshot = Snapshot(
+            {"temperature_celsius": 5, "timestamp": fetched_at}, fetched_at, "Failed to fetch data"
+        )
+
+        response = self.client.get("/temperature")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json["status"], "Too Cold")
+        self.assertTrue(response.json["stale"])
+        # The reading's timestamp is how clients tell how old a stale reading is
+        self.assertEqual(response.json["timestamp"], fetched_at)
+        self.assertEqual(max_age(response), 0)
+
+    def test_temperature_too_old(self, _running):
+        """Test that readings older than one hour are not served."""
+        TEMPERATURE_POLLER.snapshot = Snapshot(
+            {"temperature_celsius": 15}, time.time() - 3700, "Failed to fetch data"
+        )
+
+        response = self.client.get("/temperature")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json["error"], "Temperature data is too old")
+
+    def test_temperature_before_first_reading(self, _running):
+        """Test that no reading yet returns 503 with the poller error."""
+        TEMPERATURE_POLLER.snapshot = Snapshot(None, None, "API key missing")
+
+        response = self.client.get("/temperature")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json["detail"], "API key missing")
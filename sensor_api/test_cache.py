@@ -0,0 +1,191 @@
+import socket
+import threading
+import time
+import unittest
+from unittest.mock import patch
+import fakeredis
+from prometheus_client import REGISTRY
+from sensor_api.cache import CacheBackend, CacheBackendError, RedisBackend, TTLCache
+
+
+class FakeClock:
+    """Manually advanced clock for cache expiry tests."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTTLCache(unittest.TestCase):
+    """Tests for the TTL cache."""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = TTLCache("test", ttl=10, stale_ttl=20, clock=self.clock)
+
+    def test_fresh_entry_is_served_from_cache(self):
+        """Test that the loader runs once while the entry is fresh."""
+        loader_calls = []
+        loader = lambda: loader_calls.append(1) or len(loader_calls)  # noqa: E731
+
+        self.assertEqual(self.cache.get("london", loader), 1)
+        self.clock.now += 5
+        self.assertEqual(self.cache.get("london", loader), 1)
+        self.assertEqual(len(loader_calls), 1)
+
+    def test_stale_entry_is_served_while_revalidating(self):
+        """Test that a stale entry is returned immediately and refreshed in the background."""
+        self.cache.get("london", lambda: 15)
+        self.clock.now += 15
+
+        refreshed = threading.Event()
+
+        def loader():
+            refreshed.set()
+            return 20
+
+        self.assertEqual(self.cache.get("london", loader), 15)
+        self.assertTrue(refreshed.wait(1))
+        for _ in range(100):
+            if "london" not in self.cache._inflight:
+                break
+            time.sleep(0.01)
+        self.assertEqual(self.cache.get("london", loader), 20)
+
+    def test_expired_entry_is_reloaded(self):
+        """Test that an entry past the stale window is loaded synchronously."""
+        self.cache.get("london", lambda: 15)
+        self.clock.now += 31
+        self.assertEqual(self.cache.get("london", lambda: 25), 25)
+
+    def test_concurrent_misses_are_counted(self):
+        """Test that N concurrent misses count as one miss and N - 1 coalesced, then hits."""
+        cache = TTLCache("coalesce-test", ttl=10, clock=self.clock)
+        labels = {"cache": "coalesce-test"}
+        release = threading.Event()
+
+        def loader():
+            release.wait(5)
+            return 15
+
+        threads = [threading.Thread(target=cache.get, args=("london", loader)) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        # Only let the load finish once every other caller is waiting on it
+        for _ in range(500):
+            if REGISTRY.get_sample_value("cache_coalesced_total", labels) == 9:
+                break
+            time.sleep(0.01)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(REGISTRY.get_sample_value("cache_misses_total", labels), 1)
+        self.assertEqual(REGISTRY.get_sample_value("cache_coalesced_total", labels), 9)
+        self.assertEqual(cache.get("london", loader), 15)
+        self.assertEqual(REGISTRY.get_sample_value("cache_hits_total", labels), 1)
+
+    def test_errors_are_not_cached(self):
+        """Test that a failed load is raised and retried on the next call."""
+
+        def failing():
+            raise ValueError("upstream down")
+
+        with self.assertRaises(ValueError):
+            self.cache.get("london", failing)
+        self.assertEqual(self.cache.get("london", lambda: 15), 15)
+
+
+class TestSharedCache(unittest.TestCase):
+    """Tests for replicas sharing a cache through a Redis-protocol backend."""
+
+    def setUp(self):
+        self.server = fakeredis.FakeServer()
+
+    def replica(self, **kwargs):
+        """A TTLCache as one replica would create it, connected to the shared server."""
+        backend = RedisBackend(fakeredis.FakeRedis(server=self.server))
+        return TTLCache("shared-test", ttl=10, stale_ttl=20, backend=backend, **kwargs)
+
+    def test_entries_are_shared_between_replicas(self):
+        """Test that a value loaded by one replica is served by another."""
+        first, second = self.replica(), self.replica()
+
+        first.get("london", lambda: {"temperature_celsius": 15})
+        value, stored_at = second.get_entry("london", lambda: self.fail("loaded twice"))
+        self.assertEqual(value, {"temperature_celsius": 15})
+        self.assertLess(time.time() - stored_at, 1)
+
+    def test_only_one_replica_refreshes(self):
+        """Test that a replica waits for the one holding the refresh lock."""
+        first, second = self.replica(), self.replica()
+        calls = []
+        started = threading.Event()
+
+        def slow_loader():
+            calls.append("first")
+            started.set()
+            time.sleep(0.3)
+            return 15
+
+        loader = threading.Thread(target=first.get, args=("london", slow_loader))
+        loader.start()
+        started.wait(1)
+
+        self.assertEqual(second.get("london", lambda: calls.append("second") or 25), 15)
+        loader.join()
+        self.assertEqual(calls, ["first"])
+
+    def test_backend_failure_ends_wait_for_peer(self):
+        """Test that a replica stops waiting for the lock holder once the backend fails."""
+        first, second = self.replica(), self.replica()
+        self.assertIsNotNone(first.backend.acquire_lock("london", 30))
+
+        # The first lookup finds nothing, then Valkey fails while waiting for the peer
+        lookups = []
+
+        def get(key):
+            lookups.append(key)
+            if len(lookups) > 1:
+                raise CacheBackendError("connection refused")
+
+        with patch.object(second.backend, "get", side_effect=get):
+            start = time.perf_counter()
+            self.assertEqual(second.get("london", lambda: 25), 25)
+            elapsed = time.perf_counter() - start
+
+        # Waiting out lock_wait would take 10 s
+        self.assertLess(elapsed, 1)
+
+    def test_unreachable_backend_falls_back_to_memory(self):
+        """Test that the cache keeps working in process memory when Valkey is down."""
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        backend = RedisBackend.from_url(f"redis://127.0.0.1:{port}/0", timeout=0.1)
+        cache = TTLCache("fallback-test", ttl=10, backend=backend)
+        loader_calls = []
+
+        def loader():
+            loader_calls.append(1)
+            return 15
+
+        self.assertEqual(cache.get("london", loader), 15)
+        self.assertEqual(cache.get("london", loader), 15)
+        self.assertEqual(len(loader_calls), 1)
+        errors = REGISTRY.get_sample_value(
+            "cache_backend_errors_total", {"cache": "fallback-test"}
+        )
+        self.assertGreaterEqual(errors, 1)
+
+    def test_incomplete_backend_cannot_be_created(self):
+        """Test that a backend missing methods fails when created, not on first use."""
+
+        class GetOnlyBackend(CacheBackend):
+            def get(self, key):
+                return None
+
+        with self.assertRaises(TypeError):
+            GetOnlyBackend()
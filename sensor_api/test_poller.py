@@ -0,0 +1,101 @@
+import random
+import time
+import unittest
+from unittest.mock import Mock
+import fakeredis
+from sensor_api.cache import RedisBackend, TTLCache
+from sensor_api.poller import Poller, Snapshot
+from sensor_api.test_cache import FakeClock
+
+
+class TestPoller(unittest.TestCase):
+    """Tests for the background poller."""
+
+    def test_poll_publishes_snapshot(self):
+        """Test that a successful poll publishes the reading."""
+        poller = Poller("test", Mock(return_value=15), interval=60)
+
+        self.assertTrue(poller.poll_once())
+        self.assertEqual(poller.snapshot.value, 15)
+        self.assertIsNone(poller.snapshot.error)
+        self.assertLess(poller.snapshot.age(), 1)
+
+    def test_timestamped_fetch_keeps_fetch_time(self):
+        """Test that a timestamped fetch publishes the time the reading was fetched."""
+        poller = Poller("test", Mock(return_value=(15, 1000.0)), interval=60, timestamped=True)
+
+        poller.poll_once()
+        self.assertEqual(poller.snapshot, Snapshot(15, 1000.0))
+
+    def test_failed_poll_keeps_previous_reading(self):
+        """Test that a failed poll keeps the last reading and records the error."""
+        fetch = Mock(side_effect=[15, RuntimeError("upstream down")])
+        poller = Poller("test", fetch, interval=60)
+
+        poller.poll_once()
+        fetched_at = poller.snapshot.fetched_at
+        self.assertFalse(poller.poll_once())
+        self.assertEqual(poller.snapshot, Snapshot(15, fetched_at, "upstream down"))
+
+    def test_failed_first_poll_has_no_reading(self):
+        """Test that a failure before any success publishes an empty snapshot."""
+        poller = Poller("test", Mock(side_effect=RuntimeError("upstream down")), interval=60)
+
+        poller.poll_once()
+        self.assertIsNone(poller.snapshot.value)
+        self.assertIsNone(poller.snapshot.age())
+
+    def test_delay_is_jittered_and_backs_off(self):
+        """Test that delays stay within the jitter and grow while polls fail."""
+        poller = Poller(
+            "test", Mock(side_effect=RuntimeError), interval=60, jitter=0.1, backoff=2
+        )
+        self.assertTrue(54 <= poller.next_delay() <= 66)
+
+        delays = []
+        for _ in range(8):
+            poller.poll_once()
+            delays.append(poller.next_delay())
+        self.assertTrue(1 <= delays[0] <= 2)
+        self.assertTrue(8 <= delays[3] <= 16)
+        self.assertTrue(all(d <= 60 for d in delays))
+
+    def test_shared_readings_never_outlive_ttl(self):
+        """Test that replicas polling a shared cache never hold a reading past TTL plus jitter."""
+        random.seed(6)
+        clock = FakeClock()
+        server = fakeredis.FakeServer()
+        ttl, interval, jitter = 300, 300, 0.1
+
+        def replica():
+            backend = RedisBackend(fakeredis.FakeRedis(server=server))
+            cache = TTLCache("poll-test", ttl=ttl, stale_ttl=3300, backend=backend, clock=clock)
+            fetch = lambda: cache.get_entry("london", clock, serve_stale=False)  # noqa: E731
+            return Poller(
+                "test", fetch, interval, jitter, timestamped=True, max_age=ttl, clock=clock
+            )
+
+        pollers = [replica() for _ in range(3)]
+        due = [clock.now + offset for offset in (0, 100, 280)]
+        for _ in range(200):
+            i = min(range(len(pollers)), key=due.__getitem__)
+            clock.now = due[i]
+            self.assertTrue(pollers[i].poll_once())
+            due[i] = clock.now + pollers[i].next_delay()
+            # The reading just published is what this replica serves until its next poll
+            self.assertLessEqual(pollers[i].snapshot.age(due[i]), ttl + interval * jitter)
+
+    def test_start_polls_in_background(self):
+        """Test that start() polls immediately and stop() ends the thread."""
+        poller = Poller("test", Mock(return_value=15), interval=60)
+        poller.start()
+        try:
+            for _ in range(100):
+                if poller.snapshot is not None:
+                    break
+                time.sleep(0.01)
+            self.assertTrue(poller.running)
+            self.assertEqual(poller.snapshot.value, 15)
+        finally:
+            poller.stop(timeout=1)
+        self.assertFalse(poller.running)
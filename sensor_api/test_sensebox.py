@@ -0,0 +1,151 @@
+import json
+import threading
+import time
+import unittest
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+from sensor_api.errors import UpstreamError
+from sensor_api.sensebox import SenseBoxAggregator
+from sensor_api.upstream import CircuitBreaker
+
+
+def box_json(temp, age=60):
+    """A minimal openSenseMap box with one temperature sensor measured age seconds ago."""
+    created_at = datetime.fromtimestamp(time.time() - age, timezone.utc)
+    return {
+        "sensors": [
+            {"title": "PM10", "unit": "µg/m³", "lastMeasurement": {"value": "3"}},
+            {
+                "title": "Temperatur",
+                "unit": "°C",
+                "lastMeasurement": {
+                    "value": str(temp),
+                    "createdAt": created_at.isoformat().replace("+00:00", "Z"),
+                },
+            },
+        ]
+    }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Serves /boxes/<id>; ids look like '<kind>-<n>' where kind picks the behaviour."""
+
+    delay = 0.2
+    lagging_delay = 0.6
+
+    def do_GET(self):
+        box_id = self.path.split("?")[0].rsplit("/", 1)[-1]
+        kind, n = box_id.split("-")
+        if kind == "slow":
+            time.sleep(2)
+        else:
+            time.sleep(self.lagging_delay if kind == "lagging" else self.delay)
+
+        if kind == "fail":
+            self.send_response(500)
+            self.end_headers()
+            return
+
+        age = 7200 if kind == "old" else 60
+        body = json.dumps(box_json(10 + int(n), age)).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    """Stub server whose listen backlog takes every box's connection at once."""
+
+    request_queue_size = 64
+
+
+class TestSenseBoxAggregator(unittest.TestCase):
+    """Tests for the concurrent senseBox aggregation against a local stub server."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = StubServer(("127.0.0.1", 0), StubHandler)
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_mean_of_all_boxes(self):
+        """Test that the mean covers every box with a recent reading."""
+        aggregator = SenseBoxAggregator(["ok-0", "ok-1", "ok-2"], base_url=self.base_url)
+
+        result = aggregator.aggregate()
+        self.assertAlmostEqual(result.temperature_celsius, 11.0)
+        self.assertEqual(result.boxes_contributing, 3)
+        self.assertEqual(result.boxes_total, 3)
+
+    def test_wall_clock_follows_slowest_box(self):
+        """Test that 19 boxes of 0.2 s and one of 0.6 s take about 0.6 s, not 4.4 s."""
+        box_ids = [f"ok-{n}" for n in range(19)] + ["lagging-19"]
+        aggregator = SenseBoxAggregator(box_ids, base_url=self.base_url, max_workers=20)
+
+        start = time.perf_counter()
+        result = aggregator.aggregate()
+        elapsed = time.perf_counter() - start
+
+        # The lagging box is well inside the deadline, so it still counts
+        self.assertEqual(result.boxes_contributing, 20)
+        self.assertGreaterEqual(elapsed, StubHandler.lagging_delay)
+        # Fetching one box after another would take 19 * 0.2 + 0.6 = 4.4 s, and
+        # even a pool of 10 would start the lagging box, last in line, 0.2 s late
+        self.assertLess(elapsed, StubHandler.lagging_delay + StubHandler.delay)
+
+    def test_failed_and_old_boxes_degrade_result(self):
+        """Test that failing, slow and outdated boxes are skipped."""
+        aggregator = SenseBoxAggregator(
+            ["ok-0", "ok-2", "fail-1", "old-5"], base_url=self.base_url
+        )
+
+        result = aggregator.aggregate()
+        self.assertAlmostEqual(result.temperature_celsius, 11.0)
+        self.assertEqual(result.boxes_contributing, 2)
+        self.assertEqual(result.boxes_total, 4)
+
+    @patch.object(StubHandler, "delay", 0)
+    def test_failing_boxes_do_not_open_circuit(self):
+        """Test that a run of failing boxes does not cut off the healthy ones."""
+        box_ids = [f"fail-{n}" for n in range(5)] + [f"ok-{n}" for n in range(20)]
+        aggregator = SenseBoxAggregator(
+            box_ids, base_url=self.base_url, max_workers=1, failure_threshold=5
+        )
+
+        for _ in range(2):
+            result = aggregator.aggregate()
+            self.assertEqual(result.boxes_contributing, 20)
+        self.assertEqual(aggregator.client.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_deadline_averages_boxes_in_time(self):
+        """Test that boxes missing the deadline are skipped instead of delaying the result."""
+        aggregator = SenseBoxAggregator(
+            ["ok-0", "ok-2", "slow-1"], base_url=self.base_url, deadline=0.5
+        )
+
+        start = time.perf_counter()
+        result = aggregator.aggregate()
+        elapsed = time.perf_counter() - start
+
+        self.assertAlmostEqual(result.temperature_celsius, 11.0)
+        self.assertEqual(result.boxes_contributing, 2)
+        self.assertEqual(result.boxes_total, 3)
+        self.assertLess(elapsed, 1.0)
+
+    def test_no_recent_readings_fails(self):
+        """Test that an error is raised when every box times out."""
+        aggregator = SenseBoxAggregator(["ok-0"], base_url=self.base_url, timeout=0.05)
+
+        with self.assertRaises(UpstreamError):
+            aggregator.aggregate()
@@ -0,0 +1,107 @@
+import math
+import random
+import unittest
+from sensor_api.stats import TimeSeriesStore, parse_window
+
+
+def nearest_rank(values, pct):
+    """Reference percentile over a plain sorted list."""
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(pct / 100 * len(ordered))) - 1]
+
+
+class TestTimeSeriesStore(unittest.TestCase):
+    """Tests for rolling-window statistics."""
+
+    def test_parse_window(self):
+        """Test window specs in seconds, minutes, hours and days."""
+        self.assertEqual(parse_window("300"), 300)
+        self.assertEqual(parse_window("5m"), 300)
+        self.assertEqual(parse_window("1h"), 3600)
+        self.assertEqual(parse_window("1d"), 86400)
+
+    def test_matches_full_rescan(self):
+        """Test that incremental aggregates match a brute-force rescan of each window."""
+        store = TimeSeriesStore({"5m": 300, "1h": 3600}, capacity=500)
+        rng = random.Random(42)
+        samples = []
+        now = 1_000_000.0
+        for _ in range(2000):
+            now += rng.uniform(1, 20)
+            value = round(rng.uniform(-5, 35), 1)
+            samples.append((now, value))
+            store.add(value, now)
+
+        for name, span in (("5m", 300), ("1h", 3600)):
+            # Only the last `capacity` samples are kept
+            values = [v for t, v in samples[-500:] if t >= now - span]
+            stats = store.stats(name, now)
+            self.assertEqual(stats["count"], len(values))
+            self.assertEqual(stats["min"], min(values))
+            self.assertEqual(stats["max"], max(values))
+            self.assertAlmostEqual(stats["mean"], sum(values) / len(values))
+            for pct in (50, 90, 99):
+                self.assertAlmostEqual(stats[f"p{pct}"], nearest_rank(values, pct), delta=0.1)
+                self.assertTrue(stats["min"] <= stats[f"p{pct}"] <= stats["max"])
+
+    def test_percentiles_within_observed_range(self):
+        """Test that percentiles never leave [min, max], e.g. for a constant reading."""
+        store = TimeSeriesStore({"1h": 3600})
+        for i in range(10):
+            store.add(20.0, 1000.0 + i)
+
+        stats = store.stats("1h", 1010.0)
+        self.assertEqual((stats["p50"], stats["p90"], stats["p99"]), (20.0, 20.0, 20.0))
+
+    def test_old_samples_leave_window(self):
+        """Test that a query evicts samples older than the window."""
+        store = TimeSeriesStore({"5m": 300})
+        store.add(30.0, 1000.0)
+        store.add(10.0, 1200.0)
+
+        self.assertEqual(store.stats("5m", 1250.0)["max"], 30.0)
+        stats = store.stats("5m", 1350.0)
+        self.assertEqual(stats["count"], 1)
+        self.assertEqual(stats["max"], 10.0)
+        self.assertEqual(store.stats("5m", 2000.0), {"window_seconds": 300, "count": 0})
+
+    def test_trend(self):
+        """Test that a steady rise of 1 °C per 10 minutes is a trend of 6 °C per hour."""
+        store = TimeSeriesStore({"1h": 3600})
+        for i in range(6):
+            store.add(10.0 + i, 1000.0 + i * 600)
+
+        self.assertAlmostEqual(store.stats("1h", 4000.0)["trend_per_hour"], 6.0)
+
+    def test_trend_after_long_gap(self):
+        """Test that the trend stays exact when readings resume long after the first one."""
+        store = TimeSeriesStore({"5m": 300})
+        store.add(15.0, 1000.0)
+        for i in range(50):
+            store.add(10.0 + i % 3 * 0.7, 1e9 + i * 200)
+
+        # Only the last two readings, 200 s apart, are in the window
+        self.assertAlmostEqual(store.stats("5m", 1e9 + 9800)["trend_per_hour"], 12.6, places=6)
+
+    def test_sums_are_rebased_when_ring_wraps(self):
+        """Test that wrapping moves the origin to the oldest kept sample and recomputes sums."""
+        store = TimeSeriesStore({"5m": 300, "1h": 3600}, capacity=100)
+        for i in range(250):
+            store.add(20.0 + i % 7, 1e9 + i * 10)
+
+        window = store.windows["1h"]
+        # The last wrap came before sample 200, when the oldest kept sample was 101
+        self.assertEqual(store._origin, 1e9 + 101 * 10)
+        times = [1e9 + i * 10 - store._origin for i in range(150, 250)]
+        self.assertAlmostEqual(window.sum_t, sum(times))
+        self.assertAlmostEqual(window.sum_tt, sum(t * t for t in times))
+
+    def test_repeated_readings_are_ignored(self):
+        """Test that a reading with a timestamp already seen is not counted twice."""
+        store = TimeSeriesStore({"1h": 3600})
+        store.add(15.0, 1000.0)
+        store.add(15.0, 1000.0)
+
+        stats = store.stats("1h", 1000.0)
+        self.assertEqual(stats["count"], 1)
+        self.assertIsNone(stats["trend_per_hour"])
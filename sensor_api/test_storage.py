@@ -0,0 +1,179 @@
+import gzip
+import json
+import socket
+import time
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import patch
+import boto3
+from botocore.exceptions import BotoCoreError, EndpointConnectionError
+from moto import mock_aws
+from prometheus_client import REGISTRY
+from sensor_api.storage import ReadingStore
+
+# 2025-03-18 14:00:00 UTC
+HOUR = datetime(2025, 3, 18, 14, tzinfo=timezone.utc).timestamp()
+
+
+class TestReadingStore(unittest.TestCase):
+    """Tests for buffered reading storage against a moto S3 stand-in."""
+
+    def setUp(self):
+        self.mock = mock_aws()
+        self.mock.start()
+        self.client = boto3.client("s3", region_name="us-east-1")
+        self.store = ReadingStore(self.client, "sensor-data", batch_size=100)
+        self.store.ensure_bucket()
+
+    def tearDown(self):
+        self.mock.stop()
+
+    def keys(self):
+        response = self.client.list_objects_v2(Bucket="sensor-data")
+        return [obj["Key"] for obj in response.get("Contents", [])]
+
+    def test_flush_writes_partitioned_chunks(self):
+        """Test that readings are uploaded as gzipped NDJSON, one chunk per hour."""
+        for offset in (10, 20, 3610):
+            self.store.append({"timestamp": HOUR + offset, "temperature_celsius": 15})
+
+        self.assertEqual(self.store.flush(), 3)
+
+        keys = sorted(self.keys())
+        self.assertEqual(len(keys), 2)
+        self.assertTrue(keys[0].startswith("readings/date=2025-03-18/hour=14/"))
+        self.assertTrue(keys[1].startswith("readings/date=2025-03-18/hour=15/"))
+
+        body = self.client.get_object(Bucket="sensor-data", Key=keys[0])["Body"].read()
+        lines = gzip.decompress(body).splitlines()
+        timestamps = [json.loads(line)["timestamp"] for line in lines]
+        self.assertEqual(timestamps, [HOUR + 10, HOUR + 20])
+
+    def test_query_reads_only_matching_chunks(self):
+        """Test that a range query returns matching readings and skips other chunks."""
+        for offset in range(0, 7200, 600):
+            self.store.append({"timestamp": HOUR + offset, "temperature_celsius": 15})
+            self.store.flush()
+
+        with patch.object(self.client, "get_object", wraps=self.client.get_object) as get:
+            lines = list(self.store.query(HOUR + 1200, HOUR + 3000))
+
+        self.assertEqual(
+            [json.loads(line)["timestamp"] for line in lines],
+            [HOUR + 1200, HOUR + 1800, HOUR + 2400],
+        )
+        self.assertEqual(get.call_count, 3)
+
+    def test_query_finds_readings_near_chunk_bounds(self):
+        """Test that chunk names do not round a reading's time out of a query's range."""
+        # One chunk per reading, so each chunk's bounds are that reading's timestamp
+        for offset in (0.0004, 9.9996):
+            self.store.append({"timestamp": HOUR + offset, "temperature_celsius": 15})
+            self.store.flush()
+
+        self.assertEqual(len(list(self.store.query(HOUR + 0.0002, HOUR + 0.0006))), 1)
+        self.assertEqual(len(list(self.store.query(HOUR + 9.9994, HOUR + 9.9998))), 1)
+
+    def test_failed_upload_is_retried(self):
+        """Test that readings stay buffered when an upload fails."""
+        self.store.append({"timestamp": HOUR, "temperature_celsius": 15})
+
+        with patch.object(self.client, "put_object", side_effect=RuntimeError("down")):
+            self.assertEqual(self.store.flush(), 0)
+        self.assertEqual(self.store.flush(), 1)
+        self.assertEqual(len(self.keys()), 1)
+
+    def test_failed_upload_keeps_newest_readings(self):
+        """Test that requeued readings drop the oldest, not readings that arrived meanwhile."""
+        store = ReadingStore(self.client, "sensor-data", buffer_size=5)
+        for offset in range(4):
+            store.append({"timestamp": HOUR + offset, "temperature_celsius": 15})
+
+        def upload_while_readings_arrive(chunk):
+            for offset in range(10, 13):
+                store.append({"timestamp": HOUR + offset, "temperature_celsius": 15})
+            raise RuntimeError("down")
+
+        dropped = REGISTRY.get_sample_value("readings_dropped_total")
+        with patch.object(store, "_upload", side_effect=upload_while_readings_arrive):
+            self.assertEqual(store.flush(), 0)
+
+        timestamps = [reading["timestamp"] - HOUR for reading in store._buffer]
+        self.assertEqual(timestamps, [2, 3, 10, 11, 12])
+        self.assertEqual(REGISTRY.get_sample_value("readings_dropped_total"), dropped + 2)
+
+    def test_full_buffer_drops_oldest(self):
+        """Test that the ring buffer keeps only the newest readings."""
+        store = ReadingStore(self.client, "sensor-data", buffer_size=3)
+        for offset in range(5):
+            store.append({"timestamp": HOUR + offset, "temperature_celsius": 15})
+
+        store.flush()
+        timestamps = [json.loads(line)["timestamp"] for line in store.query(HOUR, HOUR + 10)]
+        self.assertEqual(timestamps, [HOUR + 2, HOUR + 3, HOUR + 4])
+
+    def test_writer_flushes_when_batch_is_full(self):
+        """Test that the background writer uploads as soon as a batch is full."""
+        store = ReadingStore(self.client, "sensor-data", batch_size=10, flush_interval=60)
+        store.start()
+        try:
+            for offset in range(10):
+                store.append({"timestamp": HOUR + offset, "temperature_celsius": 15})
+            for _ in range(100):
+                if self.keys():
+                    break
+                store._stop.wait(0.02)
+            self.assertEqual(len(self.keys()), 1)
+        finally:
+            store.stop(timeout=1)
+
+    def test_writer_retries_unreachable_storage(self):
+        """Test that readings wait in the buffer until storage is up and the bucket is created."""
+        store = ReadingStore(self.client, "late-bucket", flush_interval=0.05)
+        down = EndpointConnectionError(endpoint_url="http://minio:9000")
+
+        with patch.object(self.client, "head_bucket", side_effect=down):
+            self.assertFalse(store.ensure_bucket())
+            store.start()
+            store.append({"timestamp": HOUR, "temperature_celsius": 15})
+            store._stop.wait(0.2)
+            self.assertEqual(len(store._buffer), 1)
+
+        stored = 0
+        try:
+            for _ in range(100):
+                store._stop.wait(0.02)
+                if store._bucket_ready:
+                    stored = self.client.list_objects_v2(Bucket="late-bucket")["KeyCount"]
+                    if stored:
+                        break
+            self.assertEqual(stored, 1)
+        finally:
+            store.stop(timeout=1)
+
+
+class TestReadingStoreTimeouts(unittest.TestCase):
+    """Tests for the S3 client settings, against a real socket rather than moto."""
+
+    def test_unreachable_storage_fails_fast(self):
+        """Test that a storage endpoint that never answers fails after one short timeout."""
+        with socket.socket() as hung:
+            # Connections complete in the backlog but are never answered
+            hung.bind(("127.0.0.1", 0))
+            hung.listen(8)
+            store = ReadingStore.from_endpoint(
+                f"http://127.0.0.1:{hung.getsockname()[1]}",
+                access_key="test",
+                secret_key="test",
+                read_timeout=0.3,
+                max_attempts=1,
+                bucket="sensor-data",
+            )
+
+            start = time.perf_counter()
+            with self.assertRaises(BotoCoreError):
+                next(store.query(HOUR, HOUR + 60))
+            elapsed = time.perf_counter() - start
+
+        # botocore's defaults would wait 60 s, five times
+        self.assertLess(elapsed, 1)
@@ -0,0 +1,195 @@
+import socket
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from prometheus_client import REGISTRY
+from sensor_api.errors import UpstreamError
+from sensor_api.upstream import CircuitBreaker, CircuitOpenError, UpstreamClient
+
+
+class FakeClock:
+    """Manually advanced clock for circuit breaker tests."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    """Answers `failure_status` for the first `failures` requests, then 200."""
+
+    protocol_version = "HTTP/1.1"
+    failures = 0
+    failure_status = 503
+    requests_seen = 0
+
+    def do_GET(self):
+        cls = type(self)
+        cls.requests_seen += 1
+        status = cls.failure_status if cls.requests_seen <= cls.failures else 200
+        self.send_response(status)
+        if status == 429:
+            self.send_header("Retry-After", "3")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def closed_port():
+    """A local port with nothing listening on it."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """Tests for the circuit breaker state machine."""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(
+            "test", failure_threshold=3, reset_timeout=10, clock=self.clock
+        )
+
+    def test_opens_after_consecutive_failures(self):
+        """Test that the breaker opens only after failure_threshold failures in a row."""
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.assertTrue(self.breaker.allow())
+
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(self.breaker.allow())
+
+    def test_half_open_allows_single_trial(self):
+        """Test that one trial is allowed after reset_timeout and closes the breaker on success."""
+        for _ in range(3):
+            self.breaker.record_failure()
+        self.clock.now += 10
+
+        self.assertTrue(self.breaker.allow())
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertFalse(self.breaker.allow())
+
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_failed_trial_reopens(self):
+        """Test that a failed trial request opens the breaker again."""
+        for _ in range(3):
+            self.breaker.record_failure()
+        self.clock.now += 10
+        self.breaker.allow()
+
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(self.breaker.allow())
+
+
+class TestUpstreamClient(unittest.TestCase):
+    """Tests for the pooled upstream client against a local stub server."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), FlakyHandler)
+        cls.url = f"http://127.0.0.1:{cls.server.server_address[1]}/"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        FlakyHandler.requests_seen = 0
+        FlakyHandler.failure_status = 503
+
+    def test_retries_server_errors(self):
+        """Test that 5xx responses are retried within a single call."""
+        FlakyHandler.failures = 2
+        client = UpstreamClient("test-retry", retries=3, backoff_factor=0.01)
+
+        response = client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(FlakyHandler.requests_seen, 3)
+        self.assertEqual(client.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_rate_limit_is_backed_off_and_opens_circuit(self):
+        """Test that 429 retries use our backoff, not Retry-After, and count as failures."""
+        FlakyHandler.failures = 100
+        FlakyHandler.failure_status = 429
+        client = UpstreamClient(
+            "test-429", retries=3, backoff_factor=0.01, backoff_max=0.1, failure_threshold=1
+        )
+
+        start = time.perf_counter()
+        response = client.get(self.url)
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(FlakyHandler.requests_seen, 4)
+        # Waiting for Retry-After would take 3 * 3 s
+        self.assertLess(elapsed, 1)
+        self.assertEqual(client.breaker.state, CircuitBreaker.OPEN)
+
+    def test_latency_is_recorded(self):
+        """Test that each call is observed in the upstream latency histogram."""
+        FlakyHandler.failures = 0
+        client = UpstreamClient("test-latency", retries=0)
+
+        client.get(self.url)
+        client.get(self.url)
+        count = REGISTRY.get_sample_value(
+            "upstream_request_duration_seconds_count", {"upstream": "test-latency"}
+        )
+        self.assertEqual(count, 2)
+
+    def test_open_circuit_fails_fast(self):
+        """Test that a dead upstream opens the circuit and later calls are not sent."""
+        client = UpstreamClient("test-dead", retries=0, failure_threshold=2)
+        url = f"http://127.0.0.1:{closed_port()}/"
+
+        for _ in range(2):
+            with self.assertRaises(UpstreamError):
+                client.get(url)
+        with self.assertRaises(CircuitOpenError):
+            client.get(url)
+        state = REGISTRY.get_sample_value("upstream_circuit_state", {"upstream": "test-dead"})
+        self.assertEqual(state, CircuitBreaker.OPEN)
+
+    def test_error_does_not_leak_url(self):
+        """Test that the error and the log name the host but not the query string."""
+        client = UpstreamClient("test-redact", retries=0)
+        url = f"http://127.0.0.1:{closed_port()}/weather?appid=secret-key"
+
+        with self.assertLogs("sensor_api.upstream") as logs:
+            with self.assertRaises(UpstreamError) as raised:
+                client.get(url)
+        self.assertIn("127.0.0.1", str(raised.exception))
+        self.assertNotIn("secret-key", str(raised.exception))
+        self.assertNotIn("secret-key", "\n".join(logs.output))
+
+    def test_read_timeout_is_not_retried(self):
+        """Test that a hung upstream fails after a single timeout."""
+        client = UpstreamClient("test-hung", timeout=0.3, retries=3, backoff_factor=0.01)
+        with socket.socket() as hung:
+            # Connections complete in the backlog but are never answered
+            hung.bind(("127.0.0.1", 0))
+            hung.listen(8)
+            url = f"http://127.0.0.1:{hung.getsockname()[1]}/"
+
+            start = time.perf_counter()
+            with self.assertRaises(UpstreamError):
+                client.get(url)
+            elapsed = time.perf_counter() - start
+
+        # Each retry would add another 0.3 s timeout
+        self.assertLess(elapsed, 0.6)
@@ -0,0 +1,152 @@
+"""
+Shared HTTP client for upstream APIs.
+
+Each ``UpstreamClient`` owns a keep-alive ``requests.Session`` with a bounded
+connection pool and urllib3 retries with capped exponential backoff. Rate
+limited (429) responses are retried on the same backoff, ignoring Retry-After.
+Read timeouts are not retried, so a call never waits longer than one timeout on
+a hung upstream. A circuit breaker stops calling an upstream after repeated
+failures, 429s included, and lets a single trial request through once
+``reset_timeout`` has passed.
+"""
+
+import logging
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from prometheus_client import Gauge, Histogram
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from sensor_api.errors import UpstreamError
+
+logger = logging.getLogger(__name__)
+
+# Prometheus Metrics
+UPSTREAM_LATENCY = Histogram(
+    "upstream_request_duration_seconds", "Latency of upstream HTTP requests", ["upstream"]
+)
+CIRCUIT_STATE = Gauge(
+    "upstream_circuit_state",
+    "Circuit breaker state (0 closed, 1 open, 2 half-open)",
+    ["upstream"],
+    multiprocess_mode="livemax",
+)
+
+
+class CircuitOpenError(UpstreamError):
+    """Raised instead of calling an upstream whose circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Opens after failure_threshold consecutive failures, half-opens after reset_timeout."""
+
+    CLOSED, OPEN, HALF_OPEN = 0, 1, 2
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._set_state(self.CLOSED)
+
+    def _set_state(self, state):
+        self.state = state
+        CIRCUIT_STATE.labels(self.name).set(state)
+
+    def allow(self):
+        """Whether a request may be sent now."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+                # Let exactly one trial request through
+                self._set_state(self.HALF_OPEN)
+                return True
+            return False
+
+    def record_success(self):
+        """Close the breaker after a successful request."""
+        with self._lock:
+            self._failures = 0
+            self._set_state(self.CLOSED)
+
+    def record_failure(self):
+        """Count a failed request, opening the breaker at the threshold or after a failed trial."""
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = self._clock()
+                self._set_state(self.OPEN)
+
+
+class UpstreamClient:
+    """Pooled, retrying HTTP client guarded by a circuit breaker."""
+
+    def __init__(
+        self,
+        name,
+        pool_size=10,
+        timeout=5,
+        retries=3,
+        backoff_factor=0.5,
+        backoff_max=10,
+        failure_threshold=5,
+        reset_timeout=30,
+    ):
+        self.name = name
+        self.timeout = timeout
+        self.breaker = CircuitBreaker(name, failure_threshold, reset_timeout)
+
+        retry = Retry(
+            total=retries,
+            # A hung upstream fails after one timeout instead of holding the caller
+            # for every retry; refused connections and 5xx responses are still retried
+            read=0,
+            backoff_factor=backoff_factor,
+            backoff_max=backoff_max,
+            status_forcelist=(429, 500, 502, 503, 504),
+            # Rate limits are backed off like any other retry; a Retry-After of
+            # minutes or hours would otherwise hold the poller and coalesced requests
+            respect_retry_after_header=False,
+            allowed_methods=("GET",),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def get(self, url, **kwargs):
+        """GET url, raising UpstreamError on connection errors or an open circuit.
+
+        HTTP error statuses are returned to the caller; 5xx and 429 responses still
+        count as failures for the circuit breaker.
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"{self.name} is unavailable")
+
+        kwargs.setdefault("timeout", self.timeout)
+        start = time.perf_counter()
+        try:
+            response = self.session.get(url, **kwargs)
+        except requests.RequestException as e:
+            self.breaker.record_failure()
+            # The exception text contains the full URL, API keys included, so only
+            # the host and the kind of failure are logged and passed on
+            message = f"{self.name} request to {urlsplit(url).hostname} failed: {type(e).__name__}"
+            logger.warning(message)
+            raise UpstreamError(message) from e
+        finally:
+            UPSTREAM_LATENCY.labels(self.name).observe(time.perf_counter() - start)
+
+        if response.status_code >= 500 or response.status_code == 429:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return response